@@ -0,0 +1,142 @@
+"""
+Async Database Helper Functions
+
+Async counterparts of the helpers in database.py, on the Motor driver, for
+use from async routes: awaiting these never blocks the event loop, so DB
+calls can run concurrently with upstream calls. Connection settings are
+shared with the sync helpers.
+"""
+
+import os
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable, List, Optional, Union
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pydantic import BaseModel
+
+import database
+
+_client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
+
+
+def get_db() -> Optional[AsyncIOMotorDatabase]:
+    """The async database handle, created on first use (None if not configured)"""
+    global _client, db
+    if db is None and database.database_url and database.database_name:
+        _client = AsyncIOMotorClient(database.database_url, **database.client_options())
+        db = _client[database.database_name]
+    return db
+
+
+def close():
+    """Close the async client and its connection pool"""
+    global _client, db
+    if _client is not None:
+        _client.close()
+    _client = None
+    db = None
+
+
+def _reset_after_fork():
+    global _client, db
+    _client = None
+    db = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _require_db() -> AsyncIOMotorDatabase:
+    adb = get_db()
+    if adb is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    return adb
+
+
+async def create_document(collection_name: str, data: Union[BaseModel, dict]) -> str:
+    """Insert a single document with timestamp"""
+    adb = _require_db()
+    data_dict = data.model_dump() if isinstance(data, BaseModel) else data.copy()
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+
+    result = await adb[collection_name].insert_one(data_dict)
+    return str(result.inserted_id)
+
+
+async def create_documents(collection_name: str, documents: Iterable[Union[BaseModel, dict]],
+                           batch_size: int = 1000) -> List[str]:
+    """Insert many documents with timestamps, in unordered insert_many batches"""
+    adb = _require_db()
+    inserted_ids = []
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+        docs = database._to_dicts(batch)
+        now = datetime.now(timezone.utc)
+        for doc in docs:
+            doc['created_at'] = now
+            doc['updated_at'] = now
+        result = await adb[collection_name].insert_many(docs, ordered=False)
+        inserted_ids.extend(str(_id) for _id in result.inserted_ids)
+    return inserted_ids
+
+
+async def iter_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                         batch_size: int = 1000, projection: dict = None, sort: list = None,
+                         after_id: Any = None) -> AsyncIterator[dict]:
+    """Stream documents in batches; same semantics as database.iter_documents"""
+    adb = _require_db()
+    collection = adb[collection_name]
+    filter_dict = filter_dict or {}
+
+    if sort is not None:
+        if after_id is not None:
+            raise ValueError("after_id can only be used with the default _id order")
+        cursor = collection.find(filter_dict, projection).sort(sort).batch_size(batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for document in cursor:
+            yield document
+        return
+
+    strip_id = bool(projection) and projection.get("_id") in (0, False)
+    if strip_id:
+        projection = {key: value for key, value in projection.items() if key != "_id"} or None
+
+    # limit=0 means no limit, as it does for a Mongo cursor
+    remaining = limit or None
+    while remaining is None or remaining > 0:
+        page_filter = filter_dict
+        if after_id is not None:
+            page_filter = {"$and": [filter_dict, {"_id": {"$gt": after_id}}]}
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        page = await collection.find(page_filter, projection).sort("_id", 1).limit(page_size).to_list(page_size)
+        for document in page:
+            after_id = document["_id"]
+            if strip_id:
+                del document["_id"]
+            yield document
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < page_size:
+            return
+
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                        projection: dict = None) -> List[dict]:
+    """Get documents from collection"""
+    return [doc async for doc in iter_documents(collection_name, filter_dict, limit=limit, projection=projection)]
+
+
+async def bulk_write(collection_name: str, operations: list, ordered: bool = False):
+    """Run a batch of write operations (unordered by default)"""
+    adb = _require_db()
+    if not operations:
+        return None
+    return await adb[collection_name].bulk_write(operations, ordered=ordered)
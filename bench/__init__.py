@@ -0,0 +1,15 @@
+"""
+Benchmarks
+
+Each module measures one part of the request path and prints its numbers;
+run them from the repository root:
+
+    python -m bench                     # everything that can run here
+    python -m bench search compression  # just these
+
+Upstream calls go to an in-process mock (httpx.MockTransport) with a fixed
+simulated latency, so no API key or network is needed. The database
+benchmarks need a real MongoDB: they run against DATABASE_URL /
+DATABASE_NAME, only touch collections prefixed `bench_`, and drop them
+afterwards.
+"""
@@ -0,0 +1,28 @@
+import importlib
+import sys
+
+# Benchmark name: module
+BENCHMARKS = {
+    "search": "bench.search",
+    "indexes": "bench.index_queries",
+    "cursor": "bench.cursor_memory",
+    "bulk_insert": "bench.bulk_insert",
+    "async_db": "bench.async_db",
+    "serialization": "bench.serialization",
+    "compression": "bench.compression_cost",
+    "dedup": "bench.dedup",
+    "job_model": "bench.job_model",
+}
+
+
+def main(names):
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"unknown benchmark(s): {', '.join(unknown)}; choose from {', '.join(BENCHMARKS)}")
+    for name in names or BENCHMARKS:
+        print(f"== {name}")
+        importlib.import_module(BENCHMARKS[name]).main()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
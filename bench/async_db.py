@@ -0,0 +1,68 @@
+"""
+Requests/second for a DB-backed route, sync helpers against async ones
+(needs MongoDB).
+
+"sync" is a `def` route calling database.get_documents from the
+threadpool; "async" is an `async def` route awaiting
+async_database.get_documents. Both read the same 20 documents per request.
+"""
+
+import asyncio
+import os
+
+import httpx
+from fastapi import FastAPI
+
+import async_database
+import database
+from bench.common import bench_db, print_table, run_load, sample_jobs
+
+REQUESTS = int(os.getenv("BENCH_DB_REQUESTS", 2000))
+CONCURRENCY = (10, 100)
+
+
+def app() -> FastAPI:
+    bench = FastAPI()
+
+    @bench.get("/sync")
+    def read_sync():
+        return {"count": len(database.get_documents("bench_async", {"n": {"$lt": 20}}, projection={"_id": 0}))}
+
+    @bench.get("/async")
+    async def read_async():
+        documents = await async_database.get_documents("bench_async", {"n": {"$lt": 20}}, projection={"_id": 0})
+        return {"count": len(documents)}
+
+    return bench
+
+
+async def run():
+    transport = httpx.ASGITransport(app=app())
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in CONCURRENCY:
+            for route in ("sync", "async"):
+
+                async def call(n: int):
+                    (await client.get(f"/{route}")).raise_for_status()
+
+                rows.append({"route": route, "concurrency": concurrency, **await run_load(call, REQUESTS, concurrency)})
+    print_table(f"DB-backed route, {REQUESTS} requests", rows)
+
+
+def main():
+    db = bench_db()
+    if db is None or bench_db(sync=False) is None:
+        return
+    db.drop_collection("bench_async")
+    try:
+        db.bench_async.insert_many([{**job, "n": n} for n, job in enumerate(sample_jobs(1000))])
+        db.bench_async.create_index("n")
+        asyncio.run(run())
+    finally:
+        db.drop_collection("bench_async")
+        async_database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Insert throughput in documents/second (needs MongoDB).
+
+create_document (one insert per round trip) against create_documents
+(unordered insert_many batches), for plain dicts and for Pydantic models.
+"""
+
+import os
+import time
+
+import database
+from bench.common import bench_db, print_table
+from schemas import User
+
+DOCS = int(os.getenv("BENCH_INSERT_DOCS", 100_000))
+# One round trip per document is slow; a sample is enough
+SINGLE_DOCS = min(DOCS, 5_000)
+
+
+def events(count: int):
+    return [{"user_id": f"user{n % 1000}", "activity_type": "search", "details": {"query": f"q{n}"}}
+            for n in range(count)]
+
+
+def users(count: int):
+    return [User(name=f"User {n}", email=f"user{n}@example.com", address="Berlin") for n in range(count)]
+
+
+def rate(insert, documents) -> float:
+    started = time.perf_counter()
+    insert(documents)
+    return len(documents) / (time.perf_counter() - started)
+
+
+def main():
+    db = bench_db()
+    if db is None:
+        return
+
+    def one_by_one(documents):
+        for document in documents:
+            database.create_document("bench_insert", document)
+
+    rows = []
+    try:
+        for kind, make in (("dict", events), ("pydantic", users)):
+            rows.append({"documents": kind, "helper": "create_document",
+                         "docs_per_s": rate(one_by_one, make(SINGLE_DOCS))})
+            for batch_size in (100, 1000):
+                rows.append({"documents": kind, "helper": f"create_documents(batch_size={batch_size})",
+                             "docs_per_s": rate(lambda docs: database.create_documents("bench_insert", docs,
+                                                                                      batch_size=batch_size),
+                                                make(DOCS))})
+            db.drop_collection("bench_insert")
+        print_table("Insert throughput", rows)
+    finally:
+        db.drop_collection("bench_insert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Shared pieces: realistic job payloads, a mock upstream and a load driver"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+# Every benchmark runs without the upstream rate limiter pacing it
+os.environ.setdefault("UPSTREAM_MAX_RPS", "1000000")
+os.environ.setdefault("UPSTREAM_BURST", "1000000")
+
+_WORDS = [f"word{i}" for i in range(3000)]
+
+
+def sample_job(n: int, rnd: random.Random) -> Dict[str, Any]:
+    """A Fantastic.jobs-shaped job with AI and LinkedIn enrichment"""
+    return {
+        "id": 1_000_000 + n,
+        "date_posted": "2024-05-01T10:00:00",
+        "date_created": "2024-05-01T11:00:00",
+        "title": "Senior " + rnd.choice(_WORDS),
+        "organization": f"Org{rnd.randrange(5000)}",
+        "organization_url": f"https://org.example/{n}",
+        "date_validthrough": None,
+        "locations_raw": [{"@type": "Place", "address": {"addressCountry": "DE", "addressLocality": "Berlin"}}],
+        "salary_raw": None,
+        "employment_type": ["FULL_TIME"],
+        "url": f"https://jobs.example/{n}",
+        "source_type": "ats",
+        "source": rnd.choice(["greenhouse", "lever", "workday"]),
+        "source_domain": "boards.greenhouse.io",
+        "description_text": " ".join(rnd.choice(_WORDS) for _ in range(300)),
+        "cities_derived": ["Berlin"],
+        "countries_derived": ["Germany"],
+        "locations_derived": ["Berlin, Berlin, Germany"],
+        "lats_derived": [52.52],
+        "lngs_derived": [13.40],
+        "remote_derived": False,
+        "ai_salary_currency": "EUR",
+        "ai_salary_minvalue": 60000,
+        "ai_salary_maxvalue": 80000,
+        "ai_key_skills": ["python", "spark", "sql", "airflow"],
+        "ai_core_responsibilities": "Build pipelines.",
+        "ai_requirements_summary": "5 years of python.",
+        "linkedin_org_employees": 1200,
+        "linkedin_org_industry": "Software",
+        "linkedin_org_description": "Company " * 40,
+    }
+
+
+def sample_jobs(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [sample_job(n, rnd) for n in range(count)]
+
+
+def mock_upstream(body: bytes, latency: float) -> httpx.AsyncClient:
+    """An upstream client whose every request answers `body` after `latency` seconds"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, content=body, headers={
+            "content-type": "application/json",
+            "x-ratelimit-requests-remaining": "1000000",
+        })
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(call: Callable[[int], Awaitable[Any]], requests: int, concurrency: int) -> Dict[str, float]:
+    """Make `requests` calls, at most `concurrency` at a time; latency in ms and requests/s"""
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for n in counter:
+            started = time.perf_counter()
+            await call(n)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": requests / elapsed,
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Best wall time of `repeat` runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def print_table(title: str, rows: List[Dict[str, Any]]):
+    print(f"\n{title}")
+    if not rows:
+        return
+    columns = list(rows[0])
+    cells = [[_format(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(cell[i]) for cell in cells)) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for cell in cells:
+        print("  ".join(value.ljust(width) for value, width in zip(cell, widths)))
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.1f}" if value >= 10 else f"{value:.3f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def bench_db(sync: bool = True) -> Optional[Any]:
+    """The configured database, or None (with a note) if there is none"""
+    if sync:
+        import database
+        db = database.connect()
+    else:
+        import async_database
+        db = async_database.get_db()
+    if db is None:
+        print("  skipped: needs a MongoDB server (set DATABASE_URL and DATABASE_NAME)")
+    return db
@@ -0,0 +1,74 @@
+"""
+Bytes on the wire and CPU per response for each available encoding.
+
+A whole 500-job JSON page is compressed in one go, and the same jobs as
+NDJSON chunk by chunk with a flush per line, the way streamed searches
+are. Encodings whose module is not installed are skipped. Last, a
+cache hit is served twice: the first renders and compresses the body,
+the repeat is answered from compression.compressed_bodies.
+"""
+
+import asyncio
+import time
+
+import cache
+import compression
+import fastjson
+from bench.common import print_table, sample_jobs, timed
+
+PAGE_SIZE = 500
+
+
+def main():
+    jobs = sample_jobs(PAGE_SIZE)
+    body = fastjson.dumps({"jobs": jobs, "count": len(jobs)})
+    lines = [fastjson.dumps(job) + b"\n" for job in jobs]
+
+    rows = [{"encoding": "identity", "mode": "page", "bytes": len(body), "ratio": 1.0, "cpu_ms": 0.0}]
+    for encoding in compression.ENCODINGS:
+        compressed = compression._compress(body, encoding)
+        rows.append({
+            "encoding": encoding,
+            "mode": "page",
+            "bytes": len(compressed),
+            "ratio": len(compressed) / len(body),
+            "cpu_ms": timed(lambda: compression._compress(body, encoding)) * 1000,
+        })
+    for encoding in compression.ENCODINGS:
+        started = time.thread_time()
+        compressor = compression.StreamCompressor(encoding)
+        size = sum(len(compressor.feed(line, last=n == len(lines) - 1)) for n, line in enumerate(lines))
+        rows.append({
+            "encoding": encoding,
+            "mode": "ndjson",
+            "bytes": size,
+            "ratio": size / len(body),
+            "cpu_ms": (time.thread_time() - started) * 1000,
+        })
+    print_table(f"Compression, {PAGE_SIZE}-job page ({len(body) / 1024:.0f} KiB)", rows)
+
+    async def cache_hits():
+        from main import cache_hit_response
+
+        cache_key = "bench:cache-hit"
+        cache.search_cache.set(cache_key, {"jobs": jobs}, ttl=600, size=len(body))
+        encoding = compression.ENCODINGS[0]
+
+        async def build_body():
+            return {"jobs": jobs, "count": len(jobs)}
+
+        hits = []
+        for _ in range(2):
+            started = time.perf_counter()
+            await cache_hit_response(build_body, cache_key, "", encoding)
+            hits.append({"encoding": encoding, "hit": "repeat" if hits else "first",
+                         "ms": (time.perf_counter() - started) * 1000})
+        return hits
+
+    print_table("Cache hits", asyncio.run(cache_hits()))
+    if not compression.AVAILABLE["br"] or not compression.AVAILABLE["zstd"]:
+        print("  (install brotli and zstandard to compare br and zstd)")
+
+
+if __name__ == "__main__":
+    main()
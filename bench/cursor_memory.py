@@ -0,0 +1,51 @@
+"""
+Peak Python memory reading a whole collection (needs MongoDB).
+
+"list" is what get_documents used to do, list(find()); "iter" walks the
+same collection with database.iter_documents and keeps nothing. Peak
+memory is traced with tracemalloc, so it covers Python objects only.
+"""
+
+import gc
+import os
+import time
+import tracemalloc
+
+import database
+from bench.common import bench_db, print_table, sample_jobs
+
+DOCS = int(os.getenv("BENCH_CURSOR_DOCS", 200_000))
+
+
+def peak(read):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = read()
+    elapsed = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"documents": count, "peak_mib": peak_bytes / 2**20, "seconds": elapsed}
+
+
+def main():
+    db = bench_db()
+    if db is None:
+        return
+    db.drop_collection("bench_cursor")
+    try:
+        jobs = sample_jobs(1000)
+        for first in range(0, DOCS, len(jobs)):
+            db.bench_cursor.insert_many([{**job, "n": first + n} for n, job in enumerate(jobs)], ordered=False)
+
+        rows = [
+            {"read": "list", **peak(lambda: len(list(db.bench_cursor.find())))},
+            {"read": "iter", **peak(lambda: sum(1 for _ in database.iter_documents("bench_cursor")))},
+        ]
+        print_table(f"Reading {DOCS:,} jobs", rows)
+    finally:
+        db.drop_collection("bench_cursor")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cost and accuracy of dedup.collapse.
+
+Throughput is the time to collapse one search page, for provider dicts
+and for normalized Jobs. Accuracy is measured on synthetic near-duplicates:
+every sample job gets a copy with a tracking parameter on its URL and a
+share of its description words replaced. A fold is correct if the
+alternate is a copy of the job it was folded into; recall is the share of
+copies that were folded at all.
+"""
+
+import random
+from typing import Any, Dict, List, Tuple
+
+import dedup
+from bench.common import print_table, sample_jobs, timed
+from job_model import from_provider_jobs
+
+PAGE_SIZES = (100, 500)
+ACCURACY_JOBS = 1000
+# Share of description words replaced in each copy
+EDIT_RATES = (0.0, 0.02, 0.05, 0.1, 0.2, 0.4)
+
+
+def near_duplicates(jobs: List[Dict[str, Any]], edit_rate: float, seed: int = 2) -> Tuple[List[Dict], Dict[int, int]]:
+    """The jobs and an edited copy of each, shuffled, with copy id: original id"""
+    rnd = random.Random(seed)
+    copies, origin = [], {}
+    for job in jobs:
+        words = job["description_text"].split()
+        for i in rnd.sample(range(len(words)), int(len(words) * edit_rate)):
+            words[i] = f"edit{rnd.randrange(1_000_000)}"
+        copy_id = job["id"] + 10_000_000
+        origin[copy_id] = job["id"]
+        copies.append({**job, "id": copy_id, "url": job["url"] + "?utm_source=feed",
+                       "description_text": "  ".join(words)})
+    mixed = jobs + copies
+    rnd.shuffle(mixed)
+    return mixed, origin
+
+
+def accuracy(edit_rate: float) -> Dict[str, Any]:
+    jobs, origin = near_duplicates(sample_jobs(ACCURACY_JOBS), edit_rate)
+    collapsed, _ = dedup.collapse(jobs)
+    folded = correct = 0
+    for job in collapsed:
+        root = origin.get(job["id"], job["id"])
+        for alternate in job.get("alternates", ()):
+            folded += 1
+            correct += origin.get(alternate["id"], alternate["id"]) == root
+    return {
+        "edited": f"{edit_rate:.0%}",
+        "precision": correct / folded if folded else 1.0,
+        "recall": correct / len(origin),
+    }
+
+
+def main():
+    rows = []
+    for page_size in PAGE_SIZES:
+        jobs, _ = near_duplicates(sample_jobs(page_size // 2), 0.05)
+        for kind, page in (("dict", jobs), ("Job", from_provider_jobs("fantastic", jobs))):
+            seconds = timed(lambda: dedup.collapse(page), repeat=3)
+            rows.append({"jobs": page_size, "input": kind, "ms": seconds * 1000, "jobs_per_s": page_size / seconds})
+    print_table("collapse, half the page near-duplicates", rows)
+    print_table(f"Accuracy, {ACCURACY_JOBS} jobs + one copy each (threshold {dedup.THRESHOLD})",
+                [accuracy(rate) for rate in EDIT_RATES])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Query latency on a large jobs collection, with and without the registry's
+indexes (needs MongoDB).
+
+Fills `bench_jobs` with BENCH_INDEX_DOCS jobs (1M by default) and
+`bench_users` with a tenth as many users, times the lookups the app makes
+as collection scans, builds the indexes declared in indexes.INDEXES and
+times them again.
+"""
+
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import DESCENDING
+
+import indexes
+from bench.common import bench_db, print_table
+
+DOCS = int(os.getenv("BENCH_INDEX_DOCS", 1_000_000))
+BATCH = 10_000
+RUNS = 20
+
+
+def fill(db, rnd: random.Random):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for first in range(0, DOCS, BATCH):
+        db.bench_jobs.insert_many([
+            {
+                "provider": "fantastic",
+                "job_id": str(n),
+                "title": f"Engineer {rnd.randrange(5000)}",
+                "description_text": f"Work on system {rnd.randrange(20000)} with team {rnd.randrange(500)}",
+                "organization": f"Org{rnd.randrange(20000)}",
+                "date_posted": (start + timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%S"),
+                "date_created": (start + timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            for n in range(first, min(first + BATCH, DOCS))
+        ], ordered=False)
+    users = DOCS // 10
+    for first in range(0, users, BATCH):
+        db.bench_users.insert_many(
+            [{"email": f"user{n}@example.com", "name": f"User {n}"} for n in range(first, min(first + BATCH, users))],
+            ordered=False,
+        )
+
+
+def queries(rnd: random.Random):
+    users = DOCS // 10
+    return {
+        "user by email": lambda db: db.bench_users.find_one({"email": f"user{rnd.randrange(users)}@example.com"}),
+        "jobs of an organization, newest first": lambda db: list(
+            db.bench_jobs.find({"provider": "fantastic", "organization": f"Org{rnd.randrange(20000)}"})
+            .sort("date_posted", DESCENDING).limit(20)
+        ),
+        "newest jobs": lambda db: list(
+            db.bench_jobs.find({"provider": "fantastic"}).sort("date_posted", DESCENDING).limit(20)
+        ),
+        "job by provider id": lambda db: db.bench_jobs.find_one(
+            {"provider": "fantastic", "job_id": str(rnd.randrange(DOCS))}
+        ),
+        "text search": lambda db: list(
+            db.bench_jobs.find({"$text": {"$search": f'"system {rnd.randrange(20000)}"'}}).limit(20)
+        ),
+    }
+
+
+def time_queries(db, rnd: random.Random, indexed: bool):
+    times = {}
+    for name, query in queries(rnd).items():
+        if name == "text search" and not indexed:
+            # $text needs the text index; the scan equivalent is a regex
+            query = lambda db: list(  # noqa: E731
+                db.bench_jobs.find({"description_text": {"$regex": f"system {rnd.randrange(20000)} "}}).limit(20)
+            )
+        samples = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            query(db)
+            samples.append(time.perf_counter() - started)
+        times[name] = statistics.median(samples) * 1000
+    return times
+
+
+def main():
+    db = bench_db()
+    if db is None:
+        return
+    rnd = random.Random(1)
+    db.drop_collection("bench_jobs")
+    db.drop_collection("bench_users")
+    try:
+        started = time.perf_counter()
+        fill(db, rnd)
+        print(f"  loaded {DOCS:,} jobs in {time.perf_counter() - started:.0f}s")
+        scans = time_queries(db, rnd, indexed=False)
+
+        started = time.perf_counter()
+        db.bench_jobs.create_indexes(indexes.INDEXES["jobs"])
+        db.bench_users.create_indexes(indexes.INDEXES["users"])
+        print(f"  built indexes in {time.perf_counter() - started:.0f}s")
+        indexed = time_queries(db, rnd, indexed=True)
+
+        print_table(f"Median query latency, {DOCS:,} jobs", [
+            {"query": name, "scan_ms": scans[name], "indexed_ms": indexed[name]} for name in scans
+        ])
+    finally:
+        db.drop_collection("bench_jobs")
+        db.drop_collection("bench_users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory and JSON cost of cached jobs, provider dicts against compact Jobs.
+
+"dict" is a decoded upstream page as the search cache used to hold it;
+"Job" is the same page after job_model.from_provider_jobs, which is what
+a cache entry holds once compact_cache_entry has run. Memory is traced
+with tracemalloc (Python objects only) and given per job.
+"""
+
+import gc
+import os
+import time
+import tracemalloc
+
+import orjson
+
+import fastjson
+from bench.common import print_table, sample_jobs, timed
+from job_model import from_provider_jobs
+
+JOBS = int(os.getenv("BENCH_JOB_MODEL_JOBS", 50_000))
+PAGE_SIZE = 500
+
+
+def traced(build):
+    """Python memory held by what `build` returns, and the seconds it took"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - started
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return held, elapsed
+
+
+def main():
+    pages = [orjson.dumps(sample_jobs(PAGE_SIZE, seed=first)) for first in range(0, JOBS, PAGE_SIZE)]
+    count = len(pages) * PAGE_SIZE
+    dict_bytes, _ = traced(lambda: [orjson.loads(page) for page in pages])
+    job_bytes, _ = traced(lambda: [from_provider_jobs("fantastic", orjson.loads(page)) for page in pages])
+    print_table(f"Memory, {count:,} cached jobs", [
+        {"jobs": "dict", "bytes_per_job": dict_bytes // count},
+        {"jobs": "Job", "bytes_per_job": job_bytes // count},
+    ])
+
+    page = pages[0]
+    dicts = orjson.loads(page)
+    jobs = from_provider_jobs("fantastic", dicts)
+    fields = ["id", "title", "url"]
+    rows = []
+    for step, fn in (
+        ("decode (dict)", lambda: orjson.loads(page)),
+        ("decode + normalize (Job)", lambda: from_provider_jobs("fantastic", orjson.loads(page))),
+        ("encode dict", lambda: fastjson.dumps(dicts)),
+        ("encode Job", lambda: fastjson.dumps(jobs)),
+        ("project Job to 3 fields", lambda: [job.to_dict(fields) for job in jobs]),
+    ):
+        rows.append({"step": step, "us_per_job": timed(fn) / PAGE_SIZE * 1e6})
+    print_table(f"Per job, {PAGE_SIZE}-job page", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+/api/search latency and throughput, before and after the async client.
+
+"before" is the original route shape: a sync `def` that blocks a
+threadpool slot for the whole upstream call (simulated with time.sleep)
+and returns a dict for FastAPI to encode. "after" is main.app with the
+shared httpx client pointed at a MockTransport answering after the same
+delay. MockTransport opens no sockets, so TCP/TLS handshake savings from
+pooling are not part of these numbers; the difference is the threadpool.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import orjson
+from fastapi import FastAPI
+
+from bench.common import mock_upstream, print_table, run_load, sample_jobs
+
+LATENCY = 0.05
+PAGE_SIZE = 20
+REQUESTS = 1000
+CONCURRENCY = (10, 100, 200)
+
+
+def legacy_app(body: bytes) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/search")
+    def search_jobs(payload: dict):
+        time.sleep(LATENCY)
+        data = json.loads(body)
+        jobs = data.get("jobs") or []
+        return {"jobs": jobs, "count": len(jobs), "rate_limits": {}, "provider": "fantastic"}
+
+    return app
+
+
+async def measure(app, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Accept-Encoding": "identity"}) as client:
+
+        async def call(n: int):
+            # A different offset per request, so nothing is cached or coalesced
+            resp = await client.post("/api/search", json={
+                "api_key": "bench", "limit": PAGE_SIZE, "offset": n, "no_cache": True,
+            })
+            resp.raise_for_status()
+
+        return await run_load(call, REQUESTS, concurrency)
+
+
+async def run():
+    import main
+    import upstream
+
+    body = orjson.dumps({"jobs": sample_jobs(PAGE_SIZE)})
+    upstream._client = mock_upstream(body, LATENCY)
+    rows = []
+    for concurrency in CONCURRENCY:
+        for name, app in (("before", legacy_app(body)), ("after", main.app)):
+            rows.append({"variant": name, "concurrency": concurrency, **await measure(app, concurrency)})
+    await upstream.shutdown()
+    print_table(
+        f"/api/search, {PAGE_SIZE}-job pages, {LATENCY * 1000:.0f} ms upstream, {REQUESTS} requests", rows
+    )
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+JSON cost of a 500-job search page, stdlib path against the fastjson path.
+
+"stdlib" is what a search used to do: resp.json() (json.loads) on the
+upstream body, then FastAPI's jsonable_encoder and json.dumps for the
+response. "fastjson" is orjson.loads and FastJSONResponse.render. A DB
+page with ObjectIds and datetimes is timed the same way.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fastjson
+from bench.common import print_table, sample_jobs, timed
+
+PAGE_SIZE = 500
+
+
+def main():
+    jobs = sample_jobs(PAGE_SIZE)
+    upstream_body = orjson.dumps({"jobs": jobs})
+    response = {"jobs": jobs, "count": len(jobs), "rate_limits": {}, "provider": "fantastic"}
+    now = datetime.now(timezone.utc)
+    documents = [{"_id": ObjectId(), "created_at": now, "updated_at": now, **job} for job in jobs]
+
+    def stdlib_response(content):
+        return JSONResponse(jsonable_encoder(content, custom_encoder={ObjectId: str})).body
+
+    rows = []
+    for name, stdlib, fast in (
+        ("decode upstream body", lambda: json.loads(upstream_body), lambda: fastjson.loads(upstream_body)),
+        ("encode search response", lambda: stdlib_response(response),
+         lambda: fastjson.FastJSONResponse(response).body),
+        ("encode Mongo documents", lambda: stdlib_response(documents),
+         lambda: fastjson.FastJSONResponse(documents).body),
+    ):
+        before, after = timed(stdlib) * 1000, timed(fast) * 1000
+        rows.append({"step": name, "stdlib_ms": before, "fastjson_ms": after, "speedup": f"{before / after:.1f}x"})
+    print_table(f"JSON, {PAGE_SIZE}-job page ({len(upstream_body) / 1024:.0f} KiB)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Search Response Cache
+
+In-process TTL + LRU cache for upstream job searches. Entries are keyed on
+provider, endpoint path and the canonical (sorted) form of the params sent
+upstream, and the cache is bounded both by entry count and by total bytes.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import fastjson
+
+# Seconds a cached search stays valid, per time window. Fast-moving windows
+# expire quickly; historical ones can be served from cache for much longer.
+DEFAULT_TTLS = {
+    "hourly": 60,
+    "24h": 300,
+    "7d": 600,
+    "modified": 300,
+    "backfill": 3600,
+    "expired": 3600,
+}
+
+
+def ttl_for_window(window: str) -> int:
+    """TTL for a time window, overridable via SEARCH_CACHE_TTL_<WINDOW>"""
+    default = DEFAULT_TTLS.get(window, DEFAULT_TTLS["7d"])
+    return int(os.getenv(f"SEARCH_CACHE_TTL_{window.upper()}", default))
+
+
+def make_key(provider: str, endpoint_path: str, params: Dict[str, Any]) -> str:
+    """Canonical cache key: same params in any order map to the same key"""
+    canonical = fastjson.dumps(params, sort_keys=True).decode()
+    return f"{provider}:{endpoint_path}?{canonical}"
+
+
+class TTLCache:
+    """LRU cache with per-entry TTL and a total size bound in bytes"""
+
+    def __init__(self, max_bytes: int, max_entries: int = 10_000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # key -> (expires_at, size, value, generation)
+        self._data: "OrderedDict[str, Tuple[float, int, Any, int]]" = OrderedDict()
+        self._generation = 0
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, key: str) -> Optional[int]:
+        """Changes every time the entry is set; None if there is no entry"""
+        entry = self._data.get(key)
+        return entry[3] if entry else None
+
+    def ttl(self, key: str) -> float:
+        """Seconds until an entry expires (0 if it is missing or expired)"""
+        entry = self._data.get(key)
+        return max(entry[0] - time.monotonic(), 0.0) if entry else 0.0
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> bool:
+        """Store an entry, returning whether it was stored"""
+        # Anything larger than the whole budget is not worth caching
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+        if key in self._data:
+            self._remove(key)
+        self._generation += 1
+        self._data[key] = (time.monotonic() + ttl, size, value, self._generation)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes or len(self._data) > self.max_entries:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def replace(self, key: str, expected: Any, value: Any):
+        """Swap an entry's value in place (same expiry), if it still holds `expected`"""
+        entry = self._data.get(key)
+        if entry is not None and entry[2] is expected:
+            self._data[key] = (entry[0], entry[1], value, entry[3])
+
+    def clear(self):
+        self._data.clear()
+        self.current_bytes = 0
+
+    def _remove(self, key: str):
+        size = self._data.pop(key)[1]
+        self.current_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+search_cache = TTLCache(
+    max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 10_000)),
+)
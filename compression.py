@@ -0,0 +1,250 @@
+"""
+Response Compression
+
+ASGI middleware that compresses JSON/NDJSON/text responses with the best
+encoding the client accepts (zstd, br or gzip, by server preference):
+
+- bodies smaller than COMPRESSION_MIN_SIZE are sent as-is
+- streaming responses are compressed chunk by chunk, with a sync flush
+  after each chunk so NDJSON lines still reach the client as they are
+  written
+- responses that already carry a Content-Encoding pass through untouched,
+  which is how pre-compressed cache hits (see `compressed_bodies`) avoid
+  being compressed twice
+
+brotli and zstandard are optional; encodings whose module is missing are
+simply never negotiated.
+"""
+
+import gzip
+import os
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+# Bodies at least this large are compressed off the event loop
+OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", 256 * 1024))
+
+AVAILABLE = {
+    "zstd": zstandard is not None,
+    "br": brotli is not None,
+    "gzip": True,
+}
+# Server preference, most preferred first
+ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    if AVAILABLE.get(encoding.strip())
+]
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Rendered bodies of cache hits per encoding ("identity" for uncompressed),
+# so repeat hits skip JSON encoding and compression entirely
+compressed_bodies = cache.TTLCache(
+    max_bytes=int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    max_entries=int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", 10_000)),
+)
+
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred encoding allowed by an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, param = part.strip().partition(";")
+        q = 1.0
+        param = param.strip()
+        if param.startswith("q="):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def _record(encoding: str, raw: int, compressed: int, cpu: float, response: bool):
+    entry = _stats.setdefault(encoding, {
+        "responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0,
+    })
+    entry["responses"] += int(response)
+    entry["bytes_in"] += raw
+    entry["bytes_out"] += compressed
+    entry["cpu_seconds"] += cpu
+
+
+def stats() -> Dict[str, Any]:
+    """Bytes on the wire and compression CPU time, per encoding"""
+    report: Dict[str, Any] = {"encodings": ENCODINGS, "min_size": MIN_SIZE}
+    for encoding, entry in _stats.items():
+        responses = entry["responses"] or 1
+        report[encoding] = {
+            **entry,
+            "cpu_seconds": round(entry["cpu_seconds"], 4),
+            "ratio": round(entry["bytes_out"] / entry["bytes_in"], 4) if entry["bytes_in"] else 0.0,
+            "cpu_ms_per_response": round(entry["cpu_seconds"] * 1000 / responses, 3),
+        }
+    report["cached_bodies"] = compressed_bodies.stats()
+    return report
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    started = time.thread_time()
+    if encoding == "zstd":
+        compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    elif encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    _record(encoding, len(body), len(compressed), time.thread_time() - started, response=True)
+    return compressed
+
+
+async def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body, in a worker thread if it is large"""
+    if len(body) >= OFFLOAD_SIZE:
+        return await anyio.to_thread.run_sync(_compress, body, encoding)
+    return _compress(body, encoding)
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._compress: Callable[[bytes], bytes]
+        self._flush: Callable[[], bytes]
+        self._finish: Callable[[], bytes]
+        if encoding == "zstd":
+            obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._compress = obj.compress
+            self._flush = lambda: obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            self._finish = obj.flush
+        elif encoding == "br":
+            obj = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = obj.process
+            self._flush = obj.flush
+            self._finish = obj.finish
+        else:
+            # wbits=31: gzip container
+            obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = obj.compress
+            self._flush = lambda: obj.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = obj.flush
+        self._first = True
+
+    def feed(self, chunk: bytes, last: bool) -> bytes:
+        started = time.thread_time()
+        out = self._compress(chunk) + (self._finish() if last else self._flush())
+        _record(self.encoding, len(chunk), len(out), time.thread_time() - started, response=self._first)
+        self._first = False
+        return out
+
+
+class CompressionMiddleware:
+    """Negotiated compression for compressible responses"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self.app, encoding)(scope, receive, send)
+
+
+class _Responder:
+    def __init__(self, app: ASGIApp, encoding: str):
+        self.app = app
+        self.encoding = encoding
+        self.send: Optional[Send] = None
+        self.start: Optional[Message] = None
+        # Only set for streamed responses
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def _skip(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            "content-encoding" in headers
+            or self.start["status"] in (204, 304)
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    async def send_with_compression(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Hold the start until we know whether the body gets compressed
+            self.start = message
+            self.passthrough = self._skip(Headers(raw=message["headers"]))
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if self.passthrough or (not more_body and len(body) < MIN_SIZE):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Streaming: length unknown, compress as chunks arrive
+                del headers["Content-Length"]
+                self.compressor = StreamCompressor(self.encoding)
+                body = self.compressor.feed(body, last=False)
+            else:
+                body = await compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough or self.compressor is None:
+            await self.send(message)
+            return
+        body = self.compressor.feed(body, last=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -5,29 +5,97 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import CollectionInvalid
 from datetime import datetime, timezone
+import atexit
+import logging
 import os
+import queue
+import random
+import threading
+import time
+from functools import lru_cache
+from itertools import islice
 from dotenv import load_dotenv
-from typing import Union
-from pydantic import BaseModel
+from typing import Any, Callable, Iterable, Iterator, List, Union
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
 
 _client = None
-db = None
+_db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+def client_options() -> dict:
+    """
+    MongoClient pool/driver options from the environment.
+
+    Only variables that are set are passed, so unset ones keep the driver
+    defaults. Shared by the sync and async clients.
+    """
+    options = {}
+    int_options = {
+        "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+        "MONGO_MIN_POOL_SIZE": "minPoolSize",
+        "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    }
+    for env, option in int_options.items():
+        if os.getenv(env):
+            options[option] = int(os.getenv(env))
+    if os.getenv("MONGO_COMPRESSORS"):
+        # e.g. "zstd,snappy,zlib"; zstd/snappy need the zstandard/python-snappy packages
+        options["compressors"] = os.getenv("MONGO_COMPRESSORS")
+    if os.getenv("MONGO_READ_PREFERENCE"):
+        options["readPreference"] = os.getenv("MONGO_READ_PREFERENCE")
+    return options
+
+def connect():
+    """Create the client (call on startup); returns the database or None if not configured"""
+    global _client, _db
+    if _db is None and database_url and database_name:
+        _client = MongoClient(database_url, **client_options())
+        _db = _client[database_name]
+    return _db
+
+def close():
+    """Close the client and its pooled sockets (call on shutdown)"""
+    global _client, _db
+    if _client is not None:
+        _client.close()
+    _client = None
+    _db = None
+
+def get_db():
+    """The database handle, connecting on first use; None if not configured"""
+    return _db if _db is not None else connect()
+
+def _reset_after_fork():
+    # Sockets must not be shared with the parent; the child reconnects lazily
+    global _client, _db
+    _client = None
+    _db = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def __getattr__(name):
+    # `database.db` / `from database import db` keep working, connecting lazily
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Helper functions for common database operations
 def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
+    db = get_db()
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
@@ -37,19 +105,403 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
     result = db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+def update_document(collection_name: str, document_id: str, data: Union[BaseModel, dict]) -> bool:
+    """Update fields of a document by id, refreshing updated_at"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    data_dict = data.model_dump(exclude_unset=True) if isinstance(data, BaseModel) else dict(data)
+    data_dict['updated_at'] = datetime.now(timezone.utc)
+    result = db[collection_name].update_one({"_id": ObjectId(document_id)}, {"$set": data_dict})
+    return result.matched_count > 0
+
+def delete_document(collection_name: str, document_id: str) -> bool:
+    """Delete a document by id"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].delete_one({"_id": ObjectId(document_id)})
+    return result.deleted_count > 0
+
+def ensure_timeseries_collection(collection_name: str, time_field: str, meta_field: str = None,
+                                 granularity: str = "seconds", expire_after_seconds: int = None) -> bool:
+    """Create a time-series collection if it doesn't exist yet; True if it was created"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if collection_name in db.list_collection_names(filter={"name": collection_name}):
+        return False
+    timeseries = {"timeField": time_field, "granularity": granularity}
+    if meta_field:
+        timeseries["metaField"] = meta_field
+    options = {"timeseries": timeseries}
+    if expire_after_seconds:
+        options["expireAfterSeconds"] = expire_after_seconds
+    try:
+        db.create_collection(collection_name, **options)
+    except CollectionInvalid:
+        # Another process created it first
+        return False
+    return True
+
+@lru_cache(maxsize=None)
+def _list_adapter(model_class: type) -> TypeAdapter:
+    return TypeAdapter(List[model_class])
+
+def _to_dicts(batch: list) -> List[dict]:
+    """Convert a batch of models/dicts to plain dicts"""
+    first = type(batch[0])
+    if issubclass(first, BaseModel) and all(type(item) is first for item in batch):
+        # One pydantic-core call for the whole batch instead of model_dump per item
+        return _list_adapter(first).dump_python(batch)
+    return [item.model_dump() if isinstance(item, BaseModel) else dict(item) for item in batch]
+
+def create_documents(collection_name: str, documents: Iterable[Union[BaseModel, dict]],
+                     batch_size: int = 1000) -> List[str]:
+    """
+    Insert many documents with timestamps, in unordered insert_many batches.
+
+    Every document in a batch gets the same created_at/updated_at. Returns
+    the inserted ids in input order.
+    """
+    db = get_db()
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
-    if limit:
-        cursor = cursor.limit(limit)
-    
-    return list(cursor)
+
+    collection = db[collection_name]
+    inserted_ids = []
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+        docs = _to_dicts(batch)
+        now = datetime.now(timezone.utc)
+        for doc in docs:
+            doc['created_at'] = now
+            doc['updated_at'] = now
+        result = collection.insert_many(docs, ordered=False)
+        inserted_ids.extend(str(_id) for _id in result.inserted_ids)
+    return inserted_ids
+
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally only the fields in `projection`"""
+    return list(iter_documents(collection_name, filter_dict, limit=limit, projection=projection))
+
+def iter_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                   batch_size: int = 1000, projection: dict = None, sort: list = None,
+                   after_id: Any = None) -> Iterator[dict]:
+    """
+    Stream documents from a collection without loading them all at once.
+
+    By default documents come back in `_id` order, one `batch_size` page at
+    a time, each page starting after the last `_id` seen. Pass the last
+    `_id` you processed as `after_id` to resume an interrupted scan. With a
+    custom `sort`, a single server-side cursor is streamed in batches
+    instead (resuming with `after_id` then isn't supported).
+    """
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    collection = db[collection_name]
+    filter_dict = filter_dict or {}
+
+    if sort is not None:
+        if after_id is not None:
+            raise ValueError("after_id can only be used with the default _id order")
+        cursor = collection.find(filter_dict, projection).sort(sort).batch_size(batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        with cursor:
+            yield from cursor
+        return
+
+    # Keyset pagination needs _id even if the caller projected it away
+    strip_id = bool(projection) and projection.get("_id") in (0, False)
+    if strip_id:
+        # _id is returned unless excluded, in inclusion and exclusion projections alike
+        projection = {key: value for key, value in projection.items() if key != "_id"} or None
+
+    # limit=0 means no limit, as it does for a Mongo cursor
+    remaining = limit or None
+    while remaining is None or remaining > 0:
+        page_filter = filter_dict
+        if after_id is not None:
+            page_filter = {"$and": [filter_dict, {"_id": {"$gt": after_id}}]}
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        page = list(collection.find(page_filter, projection).sort("_id", 1).limit(page_size))
+        for document in page:
+            after_id = document["_id"]
+            if strip_id:
+                del document["_id"]
+            yield document
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < page_size:
+            return
+
+
+class BatchWriter:
+    """
+    Background writer that batches items off the request path.
+
+    Items go onto a bounded in-memory queue and a daemon thread hands them
+    to `flush` in batches of up to `batch_size`, or whatever has arrived
+    after `flush_interval` seconds. When the queue is full, the "drop"
+    policy discards new items (and counts them) without blocking, while
+    "block" applies backpressure by making `submit` wait up to
+    `block_timeout` seconds for room before dropping. `close` drains the
+    queue.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], None], batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 50_000, name: str = "batch-writer",
+                 policy: str = "drop", block_timeout: float = 1.0):
+        if policy not in ("drop", "block"):
+            raise ValueError("policy must be 'drop' or 'block'")
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    def submit(self, item: Any) -> bool:
+        if self._closed:
+            self.dropped += 1
+            return False
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def submit_many(self, items) -> int:
+        return sum(1 for item in items if self.submit(item))
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the worker thread"""
+        with self._lock:
+            if self._thread is None or self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    # Drain whatever is left behind the sentinel
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is not None:
+                            batch.append(item)
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Any]):
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            started = time.monotonic()
+            try:
+                self._flush(chunk)
+                self.flushed += len(chunk)
+            except Exception:
+                self.failed += len(chunk)
+                logger.exception("%s: failed to write %d items", self.name, len(chunk))
+            elapsed = time.monotonic() - started
+            self.batches += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self._total_flush_seconds += elapsed
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "policy": self.policy,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+            "avg_flush_ms": round(self._total_flush_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# Counters
+# --------------------------------------------------
+# increment_counter does an atomic $inc, never read-modify-write. Very hot
+# counters can be sharded: increments then land on one of COUNTER_SHARDS
+# sub-documents in "counter_shards" and reads add them up, so no single
+# document takes every write. increment_counter_later goes further and sums
+# increments in memory, flushing one $inc per counter every interval.
+
+COUNTER_SHARDS = int(os.getenv("COUNTER_SHARDS", 16))
+
+def _counter_shard_id(collection_name: str, document_id: str, field: str, shard: int) -> str:
+    return f"{collection_name}:{document_id}:{field}:{shard}"
+
+def _counter_op(collection_name: str, document_id: str, field: str, amount: Union[int, float], sharded: bool):
+    if sharded:
+        shard = random.randrange(COUNTER_SHARDS)
+        return "counter_shards", UpdateOne(
+            {"_id": _counter_shard_id(collection_name, document_id, field, shard)},
+            {
+                "$inc": {"value": amount},
+                "$setOnInsert": {"collection": collection_name, "document_id": document_id, "field": field},
+            },
+            upsert=True,
+        )
+    return collection_name, UpdateOne({"_id": ObjectId(document_id)}, {"$inc": {field: amount}})
+
+def increment_counter(collection_name: str, document_id: str, field: str,
+                      amount: Union[int, float] = 1, sharded: bool = False):
+    """Atomically add `amount` to a counter field (dotted paths allowed)"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    target, op = _counter_op(collection_name, document_id, field, amount, sharded)
+    db[target].bulk_write([op])
+
+def get_counter(collection_name: str, document_id: str, field: str) -> Union[int, float]:
+    """Current value of a counter: the document's field plus any shards"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    value = db[collection_name].find_one({"_id": ObjectId(document_id)}, {field: 1}) or {}
+    for part in field.split("."):
+        value = value.get(part, 0) if isinstance(value, dict) else 0
+    shards = list(db.counter_shards.aggregate([
+        {"$match": {"collection": collection_name, "document_id": document_id, "field": field}},
+        {"$group": {"_id": None, "total": {"$sum": "$value"}}},
+    ]))
+    return value + (shards[0]["total"] if shards else 0)
+
+def _flush_counter_deltas(batch: List[tuple]):
+    """Collapse queued increments to one delta per counter, then bulk $inc"""
+    deltas = {}
+    for key, amount in batch:
+        deltas[key] = deltas.get(key, 0) + amount
+
+    db = get_db()
+    ops_by_collection = {}
+    for (collection_name, document_id, field, sharded), amount in deltas.items():
+        if amount:
+            target, op = _counter_op(collection_name, document_id, field, amount, sharded)
+            ops_by_collection.setdefault(target, []).append(op)
+    for target, ops in ops_by_collection.items():
+        db[target].bulk_write(ops, ordered=False)
+
+counter_coalescer = BatchWriter(
+    _flush_counter_deltas,
+    batch_size=10_000,
+    flush_interval=float(os.getenv("COUNTER_FLUSH_INTERVAL", 1.0)),
+    max_queue=200_000,
+    name="counter-coalescer",
+)
+
+def increment_counter_later(collection_name: str, document_id: str, field: str,
+                            amount: Union[int, float] = 1, sharded: bool = False) -> bool:
+    """Queue an increment to be coalesced and flushed in the background"""
+    return counter_coalescer.submit(((collection_name, document_id, field, sharded), amount))
+
+
+# Sequences / references
+# --------------------------------------------------
+# Human-readable references (order numbers, SKUs, booking references) come
+# from named sequences in the "sequences" collection. Each process leases a
+# block of SEQUENCE_BLOCK_SIZE numbers with one atomic $inc and hands them out
+# from memory, so references are unique across processes and thousands can
+# be generated per second with one round-trip per block.
+
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", 100))
+
+_sequence_lock = threading.Lock()
+_sequence_blocks = {}  # name -> [next, last]
+
+def _reset_sequences():
+    # A forked worker must not hand out numbers from its parent's blocks
+    global _sequence_lock
+    _sequence_lock = threading.Lock()
+    _sequence_blocks.clear()
+
+os.register_at_fork(after_in_child=_reset_sequences)
+
+def next_sequence(name: str) -> int:
+    """Next number of a named sequence, unique across processes"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    with _sequence_lock:
+        block = _sequence_blocks.get(name)
+        if block is None or block[0] > block[1]:
+            doc = db.sequences.find_one_and_update(
+                {"_id": name},
+                {"$inc": {"value": SEQUENCE_BLOCK_SIZE}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            block = _sequence_blocks[name] = [doc["value"] - SEQUENCE_BLOCK_SIZE + 1, doc["value"]]
+        value = block[0]
+        block[0] += 1
+        return value
+
+def next_reference(prefix: str) -> str:
+    """A unique reference like ORD-20240131-00001234"""
+    return f"{prefix}-{datetime.now(timezone.utc):%Y%m%d}-{next_sequence(prefix):08d}"
+
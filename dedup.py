@@ -0,0 +1,297 @@
+"""
+Near-Duplicate Job Detection
+
+The same posting comes back from several ATS sources and across time
+windows with small text differences (tracking parameters, whitespace,
+a reworded line in the description). Exact keys miss these, so jobs are
+fingerprinted instead:
+
+- title, organization, first location and the start of the description
+  are normalized and cut into word 3-gram shingles
+- a MinHash signature (one-permutation hashing) estimates the Jaccard similarity of two jobs'
+  shingle sets
+- an LSH index splits each signature into bands; jobs sharing any band
+  are candidates, and only candidates are compared, so a lookup costs
+  the same against a thousand jobs or millions
+
+`collapse` folds duplicates within one result list into a canonical job
+that lists its alternates. With JOB_DEDUP_ENABLED, the job store also
+stamps every newly stored job with a `canonical_id` (and its signature)
+from the process-wide `job_index`. A stored `canonical_id` is never
+rewritten, and each process rebuilds `job_index` from the stored
+signatures at startup (`job_store.load_dedup_index`), so restarts and
+other workers agree with what is already in Mongo. The index keeps at
+most DEDUP_INDEX_MAX_JOBS jobs, forgetting the oldest first.
+"""
+
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from job_model import Job
+
+NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", 64))
+BANDS = int(os.getenv("DEDUP_BANDS", 16))
+# Estimated Jaccard similarity at or above which two jobs are duplicates
+THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.7))
+# Only the start of a description is fingerprinted; it is what differs least
+DESCRIPTION_CHARS = int(os.getenv("DEDUP_DESCRIPTION_CHARS", 2000))
+SHINGLE_SIZE = 3
+# Jobs the process-wide index remembers; older ones are forgotten first
+INDEX_MAX_JOBS = int(os.getenv("DEDUP_INDEX_MAX_JOBS", 200_000))
+
+_EMPTY = 1 << 32
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+")
+
+Signature = array
+
+
+def _first(job: Dict[str, Any], *fields: str) -> Any:
+    return next((job[field] for field in fields if job.get(field) not in (None, "", [])), None)
+
+
+def job_text(job: Union[Job, Dict[str, Any]]) -> str:
+    """The text a job is fingerprinted on (Job, provider or shared job shape)"""
+    if isinstance(job, Job):
+        locations, description = job.locations or "", job.description or ""
+        job = {"title": job.title, "organization": job.organization}
+    else:
+        locations = _first(job, "locations", "locations_derived", "locations_raw") or ""
+        description = _first(job, "description", "description_text", "description_html") or ""
+    if isinstance(locations, (list, tuple)):
+        locations = locations[0] if locations else ""
+    if isinstance(description, str) and "<" in description:
+        description = _TAG.sub(" ", description)
+    return " ".join((
+        str(job.get("title") or ""),
+        str(job.get("organization") or ""),
+        str(locations),
+        str(description)[:DESCRIPTION_CHARS],
+    ))
+
+
+def shingles(text: str) -> Set[int]:
+    """Hashed word 3-grams of lower-cased text"""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(hashes: Iterable[int]) -> Signature:
+    """
+    MinHash signature of a set of 32-bit shingle hashes.
+
+    Uses one-permutation hashing: each hash falls into one of NUM_PERM bins
+    and each bin keeps its minimum, so a signature costs a single pass over
+    the shingles instead of NUM_PERM passes. Empty bins borrow the value of
+    the next non-empty bin, offset by the distance (rotation densification).
+    """
+    bins = [_EMPTY] * NUM_PERM
+    for h in hashes:
+        slot = h % NUM_PERM
+        if h < bins[slot]:
+            bins[slot] = h
+    if _EMPTY in bins:
+        dense = bins[:]
+        nearest = None
+        for i in range(2 * NUM_PERM - 1, -1, -1):
+            slot = i % NUM_PERM
+            if bins[slot] != _EMPTY:
+                nearest = (bins[slot], i)
+            elif i < NUM_PERM and nearest is not None:
+                dense[slot] = nearest[0] + ((nearest[1] - i) << 32)
+        bins = dense
+    return array("Q", bins)
+
+
+def job_signature(job: Union[Job, Dict[str, Any]]) -> Optional[Signature]:
+    """A job's signature, or None if it has no text to fingerprint"""
+    hashes = shingles(job_text(job))
+    return signature(hashes) if hashes else None
+
+
+def similarity(left: Signature, right: Signature) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+class MinHashLSH:
+    """Banded LSH index over MinHash signatures"""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, threshold: float = THRESHOLD):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self._buckets: List[Dict[int, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, Signature] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, sig: Signature) -> List[int]:
+        rows = self.rows
+        return [hash(tuple(sig[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def insert(self, key: str, sig: Signature):
+        if key in self._signatures:
+            self.remove(key)
+        self._signatures[key] = sig
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str):
+        sig = self._signatures.pop(key, None)
+        if sig is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def query(self, sig: Signature) -> Optional[Tuple[str, float]]:
+        """The most similar indexed key at or above the threshold, if any"""
+        candidates: Set[str] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            bucket = buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+        best: Optional[Tuple[str, float]] = None
+        for key in candidates:
+            score = similarity(sig, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+
+class DedupIndex:
+    """Maps jobs to canonical job ids, registering unseen jobs as canonical"""
+
+    def __init__(self, max_jobs: Optional[int] = None, **lsh_options: Any):
+        self.lsh = MinHashLSH(**lsh_options)
+        self.max_jobs = max_jobs
+        self._canonical: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def _remember(self, key: str, canonical: str):
+        # Caller holds the lock
+        self._canonical[key] = canonical
+        self._canonical.move_to_end(key)
+        while self.max_jobs and len(self._canonical) > self.max_jobs:
+            oldest, _ = self._canonical.popitem(last=False)
+            self.lsh.remove(oldest)
+
+    def assign(self, key: str, job: Union[Job, Dict[str, Any]]) -> Tuple[str, Optional[Signature]]:
+        """Canonical id for a job keyed `key` (its own key if it is new), and its signature"""
+        known = self._canonical.get(key)
+        if known is not None:
+            return known, None
+        sig = job_signature(job)
+        with self._lock:
+            if sig is None:
+                # Nothing to compare on: a job of its own
+                canonical = key
+            else:
+                match = self.lsh.query(sig)
+                if match is None:
+                    self.lsh.insert(key, sig)
+                    canonical = key
+                else:
+                    canonical = match[0]
+                    self.duplicates += 1
+            self._remember(key, canonical)
+        return canonical, sig
+
+    def canonical_id(self, key: str, job: Union[Job, Dict[str, Any]]) -> str:
+        """Canonical id for a job keyed `key` (its own key if it is new)"""
+        return self.assign(key, job)[0]
+
+    def add(self, key: str, canonical: str, sig: Optional[Signature] = None):
+        """Register a job whose canonical id is already known (e.g. stored)"""
+        with self._lock:
+            if canonical == key and sig is not None:
+                self.lsh.insert(key, sig)
+            self._remember(key, canonical)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"canonical": len(self.lsh), "jobs": len(self._canonical), "duplicates": self.duplicates}
+
+
+def _alternate(job: Union[Job, Dict[str, Any]]) -> Dict[str, Any]:
+    if isinstance(job, Job):
+        job = {"id": job.provider_id, "provider": job.provider, "source": job.source, "url": job.url}
+    return {field: job[field] for field in ("id", "provider", "source", "url") if job.get(field) is not None}
+
+
+def _sources(job: Union[Job, Dict[str, Any]]) -> List[str]:
+    if isinstance(job, Job):
+        return [job.provider]
+    return job.get("sources") or []
+
+
+def collapse(jobs: List[Any], key_field: str = "id") -> Tuple[List[Any], int]:
+    """
+    Fold near-duplicates in a result list, returning (jobs, duplicates).
+
+    The first job of each group is kept as the canonical job; later ones
+    are listed in its `alternates` (and their providers added to its
+    `sources`, for shared-shape jobs).
+    """
+    index = DedupIndex()
+    positions: Dict[str, int] = {}
+    copied: Set[str] = set()
+    out: List[Any] = []
+    duplicates = 0
+    for position, job in enumerate(jobs):
+        if not isinstance(job, (dict, Job)):
+            out.append(job)
+            continue
+        job_id = job.key if isinstance(job, Job) else job.get(key_field)
+        key = str(job_id or f"#{position}")
+        if key in positions:
+            # The same job twice
+            duplicates += 1
+            continue
+        canonical = index.canonical_id(key, job)
+        if canonical == key:
+            positions[key] = len(out)
+            out.append(job)
+            continue
+        duplicates += 1
+        target = out[positions[canonical]]
+        if canonical not in copied:
+            # Jobs may be shared with the search cache; never mutate them
+            if isinstance(target, Job):
+                target = target.to_dict()
+            target = {**target, "alternates": list(target.get("alternates") or ())}
+            if "sources" in target:
+                target["sources"] = list(target["sources"])
+            out[positions[canonical]] = target
+            copied.add(canonical)
+        target["alternates"].append(_alternate(job))
+        if "sources" in target:
+            for provider in _sources(job):
+                if provider not in target["sources"]:
+                    target["sources"].append(provider)
+    return out, duplicates
+
+
+# Process-wide index linking stored jobs to their canonical job
+JOB_DEDUP_ENABLED = os.getenv("JOB_DEDUP_ENABLED", "false").lower() in ("1", "true", "yes")
+job_index = DedupIndex(max_jobs=INDEX_MAX_JOBS)
@@ -0,0 +1,53 @@
+"""
+Fast JSON
+
+orjson-based encoding/decoding for upstream bodies and API responses.
+orjson parses straight from bytes and serializes datetimes natively; Mongo
+types (ObjectId, Decimal128), Pydantic models and cached `Job`s are handled
+by `_default`.
+
+Routes that return FastJSONResponse directly skip FastAPI's
+jsonable_encoder tree walk entirely; that matters for 500-job pages.
+"""
+
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from job_model import Job
+
+# Mongo hands back naive datetimes that are really UTC
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+loads = orjson.loads
+JSONDecodeError = orjson.JSONDecodeError
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Job):
+        return value.to_dict()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to JSON bytes"""
+    option = _OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _OPTIONS
+    return orjson.dumps(value, default=_default, option=option)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
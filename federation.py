@@ -0,0 +1,136 @@
+"""
+Federated Search
+
+Helpers for querying both job providers at once: each provider's results
+are mapped onto one shared job shape, fetched concurrently with a
+per-provider timeout, and merged with exact duplicates (the same posting
+listed by both providers) collapsed into one job. Jobs are only ever
+merged across providers; within one provider, only a repeat of the same
+provider id is dropped.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from job_model import Job
+
+PROVIDERS = ("fantastic", "active")
+
+# Seconds a provider gets before it is dropped from a federated search
+PROVIDER_TIMEOUT = float(os.getenv("FEDERATED_PROVIDER_TIMEOUT", 10))
+
+
+def to_shared(provider: str, job: Any) -> Optional[Dict[str, Any]]:
+    """Map one provider job onto the shared shape (None if it has no id)"""
+    if isinstance(job, dict):
+        job = Job.from_provider(provider, job)
+    if not isinstance(job, Job) or job.key is None:
+        return None
+    return job.to_shared()
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    # The query string often is the posting id (.../view?id=111)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def dedup_key(job: Dict[str, Any]) -> Tuple[str, ...]:
+    """Key under which the same posting from different providers collides"""
+    if job.get("url"):
+        return ("url", _normalize_url(str(job["url"])))
+    locations = job.get("locations") or [""]
+    first_location = locations[0] if isinstance(locations, list) else locations
+    return (
+        "posting",
+        str(job.get("title") or "").strip().lower(),
+        str(job.get("organization") or "").strip().lower(),
+        str(first_location).strip().lower(),
+    )
+
+
+def merge(results: Dict[str, List[Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Merge per-provider job lists, newest first, returning (jobs, duplicates).
+
+    When another provider lists the same posting, the first provider's copy
+    is kept and the other provider is added to its `sources`; each kept job
+    absorbs at most one job per other provider, so several openings of the
+    same role stay apart. A provider listing the same job id twice (pages
+    overlapping) keeps one copy. `duplicates` counts every job dropped.
+    """
+    merged: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    seen: Set[str] = set()
+    duplicates = 0
+    for provider, jobs in results.items():
+        for job in jobs:
+            shared = to_shared(provider, job)
+            if shared is None:
+                continue
+            if shared["id"] in seen:
+                duplicates += 1
+                continue
+            seen.add(shared["id"])
+            kept = merged.setdefault(dedup_key(shared), [])
+            match = next((other for other in kept if provider not in other["sources"]), None)
+            if match is None:
+                kept.append(shared)
+            else:
+                match["sources"].append(provider)
+                duplicates += 1
+    # ISO 8601 dates sort chronologically as strings
+    jobs = sorted(
+        (job for kept in merged.values() for job in kept),
+        key=lambda job: str(job.get("date_posted") or ""),
+        reverse=True,
+    )
+    return jobs, duplicates
+
+
+async def fan_out(
+    searches: Dict[str, Callable[[], Awaitable[Any]]],
+    timeout: float = PROVIDER_TIMEOUT,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Run one search per provider concurrently, returning (results, errors).
+
+    A provider that fails or does not answer within `timeout` seconds is
+    left out of `results` and reported in `errors`; the others still
+    count, so total latency is bounded by the slowest provider that
+    answers in time.
+    """
+
+    async def run(provider: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        try:
+            return await asyncio.wait_for(searches[provider](), timeout), None
+        except asyncio.TimeoutError:
+            return None, {"status": "timeout", "detail": f"no response within {timeout:g}s"}
+        except HTTPException as e:
+            return None, {"status": "error", "code": e.status_code, "detail": e.detail}
+        except httpx.HTTPError as e:
+            return None, {"status": "error", "code": 502, "detail": str(e)}
+
+    outcomes = await asyncio.gather(*(run(provider) for provider in searches))
+    results: Dict[str, Any] = {}
+    errors: Dict[str, Dict[str, Any]] = {}
+    for provider, (result, error) in zip(searches, outcomes):
+        if error is None:
+            results[provider] = result
+        else:
+            errors[provider] = error
+    return results, errors
+
+
+def all_failed(errors: Dict[str, Dict[str, Any]]) -> HTTPException:
+    """The error for a federated search in which every provider failed"""
+    # The first upstream status, or 504 if every provider timed out
+    status = next((error["code"] for error in errors.values() if error.get("code")), 504)
+    return HTTPException(status_code=status, detail={"message": "Every provider failed", "providers": errors})
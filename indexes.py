@@ -0,0 +1,132 @@
+"""
+Index Registry
+
+Every collection declares its indexes here, in one place. `ensure_indexes`
+creates them idempotently (an index that already exists with the same spec
+is a no-op) and reports what was built, so it can run on every startup in
+the background or on its own as a migration step:
+
+    python indexes.py
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Expired jobs are kept this long after expiring, then removed by a TTL index
+EXPIRED_JOB_TTL_SECONDS = int(os.getenv("EXPIRED_JOB_TTL_SECONDS", 30 * 24 * 3600))
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "posts": [
+        IndexModel([("slug", ASCENDING)], name="slug"),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING)], name="author_created_at"),
+    ],
+    "post_comment_buckets": [
+        IndexModel([("post_id", ASCENDING), ("bucket", ASCENDING)], unique=True, name="post_bucket"),
+    ],
+    "products": [
+        IndexModel([("sku", ASCENDING)], unique=True, name="sku_unique"),
+    ],
+    "orders": [
+        IndexModel([("order_number", ASCENDING)], unique=True, name="order_number_unique"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "bookings": [
+        IndexModel([("booking_reference", ASCENDING)], unique=True, name="booking_reference_unique"),
+    ],
+    "user_activities": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_timestamp"),
+    ],
+    "page_views": [
+        IndexModel([("page_path", ASCENDING), ("timestamp", DESCENDING)], name="page_path_timestamp"),
+    ],
+    "page_view_rollups": [
+        IndexModel([("page_path", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+                   unique=True, name="page_path_granularity_bucket"),
+    ],
+    "counter_shards": [
+        IndexModel([("collection", ASCENDING), ("document_id", ASCENDING), ("field", ASCENDING)],
+                   name="collection_document_field"),
+    ],
+    "jobs": [
+        IndexModel([("provider", ASCENDING), ("job_id", ASCENDING)], unique=True, name="provider_job_id"),
+        IndexModel([("provider", ASCENDING), ("date_posted", DESCENDING)], name="provider_date_posted"),
+        IndexModel([("provider", ASCENDING), ("date_created", DESCENDING)], name="provider_date_created"),
+        IndexModel([("provider", ASCENDING), ("organization", ASCENDING), ("date_posted", DESCENDING)],
+                   name="provider_organization_date_posted"),
+        IndexModel([("title", TEXT), ("description_text", TEXT)],
+                   weights={"title": 10, "description_text": 1}, name="title_description_text"),
+        IndexModel([("expired_at", ASCENDING)], expireAfterSeconds=EXPIRED_JOB_TTL_SECONDS,
+                   name="expired_at_ttl"),
+        IndexModel([("canonical_id", ASCENDING)], sparse=True, name="canonical_id"),
+    ],
+}
+
+# Append-only event streams can be stored as time-series collections. They
+# have to be created as such before anything (including an index build)
+# creates them as regular collections.
+ANALYTICS_TIMESERIES = os.getenv("ANALYTICS_TIMESERIES", "false").lower() in ("1", "true", "yes")
+
+TIMESERIES_COLLECTIONS = {
+    # collection: (timeField, metaField)
+    "user_activities": ("timestamp", "user_id"),
+    "page_views": ("timestamp", "page_path"),
+}
+
+last_report: Dict[str, Any] = {}
+
+
+def ensure_timeseries_collections() -> List[str]:
+    """Create the time-series event collections if enabled; returns those created"""
+    if database.db is None or not ANALYTICS_TIMESERIES:
+        return []
+    return [
+        collection
+        for collection, (time_field, meta_field) in TIMESERIES_COLLECTIONS.items()
+        if database.ensure_timeseries_collection(collection, time_field, meta_field)
+    ]
+
+
+def ensure_indexes() -> Dict[str, Any]:
+    """Create every registered index, returning a per-collection report"""
+    if database.db is None:
+        return {}
+
+    report: Dict[str, Any] = {}
+    for collection in ensure_timeseries_collections():
+        logger.info("created time-series collection %s", collection)
+    for collection, indexes in INDEXES.items():
+        started = time.monotonic()
+        try:
+            names = database.db[collection].create_indexes(indexes)
+            report[collection] = {
+                "indexes": names,
+                "seconds": round(time.monotonic() - started, 3),
+            }
+            logger.info("indexes on %s ready: %s", collection, ", ".join(names))
+        except PyMongoError as e:
+            # e.g. an existing index with the same name but different options
+            report[collection] = {"error": str(e)}
+            logger.error("index build on %s failed: %s", collection, e)
+
+    last_report.clear()
+    last_report.update(report)
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(ensure_indexes(), indent=2))
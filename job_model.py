@@ -0,0 +1,172 @@
+"""
+Canonical Job Model
+
+Compact in-memory form of a provider job, used for search results held in
+the response cache. Provider jobs arrive as dicts with dozens of keys; a
+`Job` is normalized once at ingest:
+
+- the fields searches and dedup read (title, organization, locations,
+  description, ...) become slots under one name for both providers
+- AI and LinkedIn enrichment is packed into one JSON blob and only
+  decoded when `ai` / `linkedin` (or the full dict) is asked for
+- every other provider field is packed into a second blob
+
+`to_dict()` rebuilds the provider's own dict, keys in their original
+order, so API responses are unchanged; fastjson serializes a Job through
+it.
+"""
+
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+# Canonical field: provider fields it is read from, first non-empty wins
+CANONICAL_FIELDS = {
+    "title": ("title",),
+    "organization": ("organization",),
+    "organization_url": ("organization_url",),
+    "url": ("url",),
+    "source": ("source",),
+    "date_posted": ("date_posted",),
+    "date_created": ("date_created",),
+    "date_validthrough": ("date_validthrough",),
+    "locations": ("locations_derived", "locations_raw"),
+    "remote": ("remote_derived",),
+    "employment_type": ("employment_type",),
+    "salary": ("salary_raw",),
+    "description": ("description_text", "description_html"),
+}
+ENRICHMENT_PREFIXES = ("ai_", "linkedin_", "li_")
+LINKEDIN_PREFIXES = ("linkedin_", "li_")
+# Low-cardinality strings shared by many jobs
+_INTERNED = ("source", "employment_type", "remote")
+
+# Which provider key each canonical field came from, and the provider's
+# key order, shared between jobs of the same shape instead of stored per job
+_origins: Dict[Tuple[Optional[str], ...], Tuple[Optional[str], ...]] = {}
+_layouts: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _pack(fields: Dict[str, Any]) -> Optional[bytes]:
+    if not fields:
+        return None
+    # orjson's output buffer is over-allocated; keep an exact-size copy
+    return bytes(memoryview(orjson.dumps(fields)))
+
+
+class Job:
+    """One job, normalized from either provider"""
+
+    __slots__ = (
+        "provider", "provider_id", "_id_field",
+        *CANONICAL_FIELDS,
+        "_origin", "_layout", "_enrichment", "_extra",
+    )
+
+    @classmethod
+    def from_provider(cls, provider: str, raw: Dict[str, Any]) -> "Job":
+        job = cls.__new__(cls)
+        job.provider = provider
+        job._id_field = "id" if "id" in raw else "job_id" if "job_id" in raw else None
+        job.provider_id = raw.get(job._id_field) if job._id_field else None
+
+        consumed = {job._id_field}
+        origin: List[Optional[str]] = []
+        for field, sources in CANONICAL_FIELDS.items():
+            name = next((name for name in sources if raw.get(name) not in (None, "", [])), None)
+            value = raw[name] if name else None
+            if name:
+                consumed.add(name)
+            if isinstance(value, list):
+                value = tuple(value)
+            elif isinstance(value, str) and field in _INTERNED:
+                value = sys.intern(value)
+            setattr(job, field, value)
+            origin.append(name)
+        origin_key = tuple(origin)
+        job._origin = _origins.setdefault(origin_key, origin_key)
+        layout = tuple(raw)
+        job._layout = _layouts.setdefault(layout, layout)
+
+        enrichment: Dict[str, Any] = {}
+        extra: Dict[str, Any] = {}
+        for key, value in raw.items():
+            if key in consumed:
+                continue
+            if key.startswith(ENRICHMENT_PREFIXES):
+                enrichment[key] = value
+            else:
+                extra[key] = value
+        job._enrichment = _pack(enrichment)
+        job._extra = _pack(extra)
+        return job
+
+    @property
+    def key(self) -> Optional[str]:
+        """The provider's id for the job, as job_store.job_key would give it"""
+        for value in (self.provider_id, self.url):
+            if value not in (None, ""):
+                return str(value)
+        return None
+
+    @property
+    def id(self) -> str:
+        """Provider-qualified id, unique across providers"""
+        return f"{self.provider}:{self.key}"
+
+    @property
+    def enrichment(self) -> Dict[str, Any]:
+        """All AI and LinkedIn fields (decoded on every access, never kept)"""
+        return orjson.loads(self._enrichment) if self._enrichment else {}
+
+    @property
+    def ai(self) -> Dict[str, Any]:
+        return {key: value for key, value in self.enrichment.items() if key.startswith("ai_")}
+
+    @property
+    def linkedin(self) -> Dict[str, Any]:
+        return {key: value for key, value in self.enrichment.items() if key.startswith(LINKEDIN_PREFIXES)}
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """The job in its provider's shape, optionally only some top-level fields"""
+        wanted = set(fields) if fields else None
+        out: Dict[str, Any] = {}
+        if self._id_field and (wanted is None or self._id_field in wanted):
+            out[self._id_field] = self.provider_id
+        for field, name in zip(CANONICAL_FIELDS, self._origin):
+            if name is None or (wanted is not None and name not in wanted):
+                continue
+            value = getattr(self, field)
+            out[name] = list(value) if isinstance(value, tuple) else value
+        for blob in (self._extra, self._enrichment):
+            if blob is None:
+                continue
+            # Skip decoding blobs none of the wanted fields can be in
+            if wanted is not None and not any(f'"{field}"'.encode() in blob for field in wanted):
+                continue
+            decoded = orjson.loads(blob)
+            out.update(decoded if wanted is None else {k: v for k, v in decoded.items() if k in wanted})
+        return {key: out[key] for key in self._layout if key in out}
+
+    def to_shared(self) -> Dict[str, Any]:
+        """The job in the provider-independent shape used by federated search"""
+        shared: Dict[str, Any] = {
+            "id": self.id,
+            "provider": self.provider,
+            "provider_id": self.key,
+        }
+        for field in CANONICAL_FIELDS:
+            value = getattr(self, field)
+            shared[field] = list(value) if isinstance(value, tuple) else value
+        shared.update(self.enrichment)
+        shared["sources"] = [self.provider]
+        return shared
+
+    def __repr__(self) -> str:
+        return f"Job({self.id!r}, {self.title!r})"
+
+
+def from_provider_jobs(provider: str, jobs: Iterable[Any]) -> List[Any]:
+    """Normalize a provider's job list; anything that is not a dict is kept as-is"""
+    return [Job.from_provider(provider, job) if isinstance(job, dict) else job for job in jobs]
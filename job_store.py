@@ -0,0 +1,265 @@
+"""
+Local Job Store
+
+Persists every job we fetch from the paid APIs into the `jobs` collection so
+repeat queries can be served locally. Jobs are upserted keyed on
+(provider, provider job id) with unordered bulk writes, batched off the
+request path by a background writer.
+
+The `job_syncs` collection records when each (provider, time window) was
+last fully synced; searches whose window is fresh enough are answered from
+the local collection instead of the paid API. The indexes these queries
+rely on are declared in indexes.py.
+"""
+
+import re
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+import async_database
+import database
+import dedup
+
+JOBS_COLLECTION = "jobs"
+SYNCS_COLLECTION = "job_syncs"
+
+# How far back each time window reaches, and which job date it is measured on
+WINDOW_SPANS = {
+    "hourly": ("date_created", timedelta(hours=1)),
+    "24h": ("date_posted", timedelta(hours=24)),
+    "7d": ("date_posted", timedelta(days=7)),
+    "backfill": ("date_posted", timedelta(days=183)),
+}
+
+# Request params the local collection can answer; anything else goes upstream
+LOCAL_FILTERS = {
+    "title_filter": "title",
+    "location_filter": "locations_derived",
+    "organization_filter": "organization",
+}
+LOCAL_PASSTHROUGH = {"remote", "limit", "offset", "include_ai", "include_li", "description_filter"}
+# Fields the store adds to each job; never part of a search result
+STORE_FIELDS = (
+    "_id", "provider", "job_id", "created_at", "updated_at",
+    "canonical_id", "dedup_signature", "expired", "expired_at",
+)
+
+
+def job_key(job: Any) -> Optional[str]:
+    """The provider's id for a job, or None if it has none we can key on"""
+    if not isinstance(job, dict):
+        return None
+    for field in ("id", "job_id", "url"):
+        value = job.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def upsert_ops(provider: str, jobs: Iterable[Any], now: datetime = None) -> List[UpdateOne]:
+    """Bulk upsert operations for a batch of jobs from one provider"""
+    now = now or datetime.now(timezone.utc)
+    # Last copy of a job within a batch wins
+    latest: Dict[Tuple[str, str], dict] = {}
+    for job in jobs:
+        key = job_key(job)
+        if key is not None:
+            latest[(provider, key)] = job
+
+    ops = []
+    for (provider, key), job in latest.items():
+        fields = {**job, "provider": provider, "job_id": key, "updated_at": now}
+        on_insert: Dict[str, Any] = {"created_at": now}
+        if dedup.JOB_DEDUP_ENABLED:
+            # Near-duplicates (other ATS sources, other windows) share a canonical
+            # id. It is only written once, so a stored job never changes group.
+            canonical, sig = dedup.job_index.assign(f"{provider}:{key}", job)
+            on_insert["canonical_id"] = canonical
+            if sig is not None:
+                on_insert["dedup_signature"] = sig.tobytes()
+        ops.append(UpdateOne(
+            {"provider": provider, "job_id": key},
+            {"$set": fields, "$setOnInsert": on_insert},
+            upsert=True,
+        ))
+    return ops
+
+
+def load_dedup_index(limit: int = None) -> int:
+    """
+    Rebuild dedup.job_index from the canonical ids and signatures stored
+    with the most recently inserted jobs, returning how many were loaded.
+    """
+    limit = limit or dedup.INDEX_MAX_JOBS
+    cursor = (
+        database.db[JOBS_COLLECTION]
+        .find({"canonical_id": {"$exists": True}}, {"provider": 1, "job_id": 1, "canonical_id": 1, "dedup_signature": 1})
+        .sort("_id", DESCENDING)
+        .limit(limit)
+    )
+    docs = list(cursor)
+    # Oldest first, so the index forgets them first
+    for doc in reversed(docs):
+        sig = None
+        if doc.get("dedup_signature"):
+            sig = array("Q")
+            sig.frombytes(bytes(doc["dedup_signature"]))
+        dedup.job_index.add(f"{doc['provider']}:{doc['job_id']}", doc["canonical_id"], sig)
+    return len(docs)
+
+
+def write_jobs(provider: str, jobs: Iterable[Any]) -> int:
+    """Upsert jobs synchronously, returning how many were inserted or changed"""
+    if database.db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    ops = upsert_ops(provider, jobs)
+    if not ops:
+        return 0
+    result = database.db[JOBS_COLLECTION].bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def _flush(batch: List[Tuple[str, Any]]):
+    by_provider: Dict[str, List[Any]] = {}
+    for provider, job in batch:
+        by_provider.setdefault(provider, []).append(job)
+    now = datetime.now(timezone.utc)
+    ops = [op for provider, jobs in by_provider.items() for op in upsert_ops(provider, jobs, now)]
+    if ops:
+        database.db[JOBS_COLLECTION].bulk_write(ops, ordered=False)
+
+
+writer = database.BatchWriter(_flush, batch_size=500, flush_interval=1.0, name="job-store-writer")
+
+
+def enqueue_jobs(provider: str, jobs: Iterable[Any]):
+    """Queue jobs for a background upsert; a no-op when no database is configured"""
+    if database.db is None:
+        return
+    writer.submit_many((provider, job) for job in jobs)
+
+
+def mark_window_synced(provider: str, window: str, synced_at: datetime = None):
+    """Record that a time window has just been fully synced from upstream"""
+    synced_at = synced_at or datetime.now(timezone.utc)
+    database.db[SYNCS_COLLECTION].update_one(
+        {"_id": f"{provider}:{window}"},
+        {"$set": {"provider": provider, "window": window, "synced_at": synced_at}},
+        upsert=True,
+    )
+
+
+async def window_synced_at(provider: str, window: str) -> Optional[datetime]:
+    """When a time window was last fully synced, or None if never"""
+    adb = async_database.get_db()
+    doc = await adb[SYNCS_COLLECTION].find_one({"_id": f"{provider}:{window}"}, {"synced_at": 1})
+    if not doc or not doc.get("synced_at"):
+        return None
+    synced_at = doc["synced_at"]
+    # Mongo hands datetimes back naive (UTC)
+    if synced_at.tzinfo is None:
+        synced_at = synced_at.replace(tzinfo=timezone.utc)
+    return synced_at
+
+
+def _terms(value: str) -> Optional[List[List[str]]]:
+    """
+    Parse an upstream-style filter into OR'ed groups of AND'ed words.
+
+    "python engineer | data" becomes [["python", "engineer"], ["data"]].
+    Only plain words, `|` and OR are understood; anything else (quotes,
+    `-`, `&`, `!`, parentheses) gives None, so the search goes upstream
+    instead of matching something different.
+    """
+    groups = []
+    for part in re.split(r"\s*\|\s*|\s+OR\s+", value.strip()):
+        if not re.fullmatch(r"[\w\s]*", part):
+            return None
+        words = part.split()
+        if words:
+            groups.append(words)
+    return groups or None
+
+
+def _field_filter(field: str, groups: List[List[str]]) -> Dict[str, Any]:
+    """Match any group, a group matching when the field contains all its words"""
+    alternatives = []
+    for words in groups:
+        matches = [{field: {"$regex": re.escape(word), "$options": "i"}} for word in words]
+        alternatives.append(matches[0] if len(matches) == 1 else {"$and": matches})
+    return alternatives[0] if len(alternatives) == 1 else {"$or": alternatives}
+
+
+def local_query(provider: str, window: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Translate upstream search params into a Mongo filter.
+
+    Returns None when the search uses a window or filter the local
+    collection cannot answer faithfully, in which case it must go upstream.
+    """
+    if provider != "fantastic" or window not in WINDOW_SPANS:
+        return None
+    if any(key not in LOCAL_FILTERS and key not in LOCAL_PASSTHROUGH for key in params):
+        return None
+    # Stored jobs may lack AI/LinkedIn enrichment
+    if params.get("include_ai") or params.get("include_li"):
+        return None
+
+    date_field, span = WINDOW_SPANS[window]
+    since = (datetime.now(timezone.utc) - span).strftime("%Y-%m-%dT%H:%M:%S")
+    query: Dict[str, Any] = {
+        "provider": provider,
+        date_field: {"$gte": since},
+        "expired": {"$ne": True},
+    }
+    conditions = []
+    for param, field in LOCAL_FILTERS.items():
+        if params.get(param):
+            groups = _terms(str(params[param]))
+            if groups is None:
+                return None
+            conditions.append(_field_filter(field, groups))
+    if conditions:
+        query["$and"] = conditions
+    if params.get("description_filter"):
+        groups = _terms(str(params["description_filter"]))
+        if groups is None:
+            return None
+        # Served by the jobs text index. Quoted words are all required,
+        # bare words are alternatives; (a AND b) OR c can't be expressed
+        if len(groups) == 1:
+            search = " ".join(f'"{word}"' for word in groups[0])
+        elif all(len(words) == 1 for words in groups):
+            search = " ".join(words[0] for words in groups)
+        else:
+            return None
+        query["$text"] = {"$search": search}
+    remote = str(params.get("remote", "")).lower()
+    if remote in ("true", "false"):
+        query["remote_derived"] = remote == "true"
+    return query
+
+
+async def search_local(query: Dict[str, Any], window: str, limit: int, offset: int = 0,
+                       fields: Optional[List[str]] = None) -> List[dict]:
+    """Run a local job search, newest first, shaped like upstream results"""
+    date_field, _ = WINDOW_SPANS[window]
+    if fields:
+        # Only pull the requested fields out of Mongo
+        projection = {field: 1 for field in fields}
+        projection["_id"] = 0
+    else:
+        # Bookkeeping fields the upstream API doesn't return
+        projection = {field: 0 for field in STORE_FIELDS}
+    cursor = (
+        async_database.get_db()[JOBS_COLLECTION]
+        .find(query, projection)
+        .sort(date_field, DESCENDING)
+        .skip(offset)
+        .limit(limit)
+    )
+    return await cursor.to_list(limit)
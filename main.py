@@ -1,12 +1,59 @@
+import asyncio
 import os
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
-import requests
-from fastapi import FastAPI, HTTPException
+import httpx
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-
-app = FastAPI()
+from starlette.background import BackgroundTask
+
+import async_database
+import cache
+import compression
+import database
+import dedup
+import fastjson
+import federation
+import indexes
+import job_model
+import job_store
+import ratelimit
+import upstream
+from fastjson import FastJSONResponse
+from job_model import Job
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled clients live for the lifetime of the app (created per worker, after fork)
+    database.connect()
+    await upstream.startup()
+    # Index builds can take a while on a large collection; don't block startup
+    asyncio.get_running_loop().run_in_executor(None, indexes.ensure_indexes)
+    if dedup.JOB_DEDUP_ENABLED and database.db is not None:
+        # Pick up the canonical ids other processes already stored
+        asyncio.get_running_loop().run_in_executor(None, job_store.load_dedup_index)
+    sync_task = None
+    if os.getenv("JOB_SYNC_ENABLED", "false").lower() in ("1", "true", "yes"):
+        import sync_worker
+        sync_task = asyncio.create_task(sync_worker.run_forever())
+    yield
+    if sync_task is not None:
+        sync_task.cancel()
+    await upstream.shutdown()
+    async_database.close()
+    # Flush jobs still waiting to be written to the local store
+    await run_in_threadpool(job_store.writer.close)
+    database.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/br/zstd for large job payloads
+app.add_middleware(compression.CompressionMiddleware)
+
 
 class SearchPayload(BaseModel):
     # Which freshness window to query (Fantastic.jobs only)
@@ -65,6 +115,10 @@ class SearchPayload(BaseModel):
     limit: Optional[int] = Field(20, ge=1, le=500)
     offset: Optional[int] = Field(0, ge=0)
 
+    # Fan-out pagination: fetch up to max_results jobs across concurrent pages
+    max_results: Optional[int] = Field(None, ge=1, le=10000)
+    page_concurrency: Optional[int] = Field(4, ge=1, le=16)
+
     # Date filter (Fantastic.jobs only; not for hourly/backfill)
     date_filter: Optional[str] = None
 
@@ -73,6 +127,53 @@ class SearchPayload(BaseModel):
         None, description="text | html"
     )
 
+    # Response mode (never sent upstream)
+    fields: Optional[List[str]] = Field(
+        None, description="Only return these job fields, e.g. [\"id\", \"title\", \"organization\"]"
+    )
+    stream: Optional[bool] = Field(False, description="Stream jobs as NDJSON, one job per line")
+    dedup: Optional[bool] = Field(
+        False, description="Collapse near-duplicate jobs into one canonical job listing its alternates"
+    )
+
+    # Federated search: query both providers at once (never sent upstream)
+    federated: Optional[bool] = Field(
+        False, description="Query Fantastic.jobs and Active Jobs DB concurrently and merge the results"
+    )
+    provider_timeout: Optional[float] = Field(
+        None, gt=0, le=60, description="Seconds each provider gets in a federated search before it is dropped"
+    )
+
+    # Caching and scheduling (never sent upstream)
+    freshness: Optional[int] = Field(
+        None, ge=0, description="Serve from the local job store if its last sync is at most this many seconds old"
+    )
+    no_cache: Optional[bool] = Field(False, description="Skip the response cache for this request")
+    priority: Optional[str] = Field(
+        "high", description="high | low (low-priority searches get a fast 429 instead of queueing)"
+    )
+
+
+def project_job(job: Any, fields: Optional[List[str]]) -> Any:
+    """Keep only the requested top-level fields of a job"""
+    if not fields:
+        return job
+    if isinstance(job, Job):
+        return job.to_dict(fields)
+    if not isinstance(job, dict):
+        return job
+    return {field: job[field] for field in fields if field in job}
+
+
+def project_jobs(jobs: List[Any], fields: Optional[List[str]]) -> List[Any]:
+    if not fields:
+        return jobs
+    return [project_job(job, fields) for job in jobs]
+
+
+# Largest page size used when fanning out over pages
+PROVIDER_MAX_PAGE_SIZE = 100
+
 
 def detect_provider(api_host: str) -> str:
     if not api_host:
@@ -83,18 +184,6 @@ def detect_provider(api_host: str) -> str:
     return "fantastic"
 
 
-def get_endpoint_path_fantastic(window: str) -> str:
-    mapping = {
-        "7d": "/jobs/7d",
-        "24h": "/jobs/24h",
-        "hourly": "/jobs/hourly",
-        "backfill": "/jobs/6m",
-        "expired": "/jobs/expired",
-        "modified": "/jobs/modified",
-    }
-    return mapping.get(window, "/jobs/7d")
-
-
 def build_params(payload: SearchPayload, provider: str) -> Dict[str, Any]:
     fields = payload.model_dump()
 
@@ -164,18 +253,14 @@ def build_params(payload: SearchPayload, provider: str) -> Dict[str, Any]:
     return params
 
 
-@app.post("/api/search")
-def search_jobs(payload: SearchPayload):
-    # Prefer environment variables for security (Fantastic defaults)
-    api_key = payload.api_key or os.getenv("FANTASTIC_RAPIDAPI_KEY")
-    api_host = payload.api_host or os.getenv("FANTASTIC_RAPIDAPI_HOST", "fantastic.p.rapidapi.com")
-
-    provider = detect_provider(api_host)
-
+def provider_request(
+    payload: SearchPayload, provider: str, api_key: Optional[str], api_host: str
+) -> Tuple[str, str, Dict[str, str], Dict[str, Any]]:
+    """Endpoint path, URL, headers and params for one provider search"""
     if provider == "active":
         endpoint_path = "/modified-ats-24h"
     else:
-        endpoint_path = get_endpoint_path_fantastic(payload.time_window)
+        endpoint_path = upstream.get_endpoint_path_fantastic(payload.time_window)
 
     # Construct base URL from the provided host
     base_url = f"https://{api_host}"
@@ -187,47 +272,496 @@ def search_jobs(payload: SearchPayload):
         "Accept": "application/json",
     }
 
-    params = build_params(payload, provider)
+    return endpoint_path, url, headers, build_params(payload, provider)
+
+
+def provider_credentials(provider: str, payload: SearchPayload) -> Tuple[Optional[str], str]:
+    """API key and host for a provider in a federated search"""
+    # A RapidAPI key covers every API the account subscribes to
+    api_key = payload.api_key or os.getenv("FANTASTIC_RAPIDAPI_KEY")
+    if provider == "active":
+        api_key = os.getenv("ACTIVE_RAPIDAPI_KEY") or api_key
+        return api_key, os.getenv("ACTIVE_RAPIDAPI_HOST", "active-jobs-db.p.rapidapi.com")
+    return api_key, os.getenv("FANTASTIC_RAPIDAPI_HOST", "fantastic.p.rapidapi.com")
+
+
+@app.post("/api/search")
+async def search_jobs(payload: SearchPayload, accept_encoding: Optional[str] = Header(None)):
+    if payload.federated:
+        return await federated_search(payload)
+
+    # Prefer environment variables for security (Fantastic defaults)
+    api_key = payload.api_key or os.getenv("FANTASTIC_RAPIDAPI_KEY")
+    api_host = payload.api_host or os.getenv("FANTASTIC_RAPIDAPI_HOST", "fantastic.p.rapidapi.com")
+
+    provider = detect_provider(api_host)
+    endpoint_path, url, headers, params = provider_request(payload, provider, api_key, api_host)
 
     # If there's no key yet, return a helpful message with empty jobs to keep UI working
     if not api_key:
-        return {
+        return FastJSONResponse({
             "jobs": [],
             "count": 0,
             "note": "Add your API key to fetch live jobs.",
             "provider": provider,
             "endpoint": url,
             "params": params,
-        }
-
-    try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        # Collect rate limit headers if present
-        rl_headers = {
-            k.lower(): v
-            for k, v in resp.headers.items()
-            if k.lower().startswith("x-ratelimit") or k.lower().startswith("ratelimit")
-        }
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail={
-                "message": "Upstream API error",
-                "status": resp.status_code,
-                "text": resp.text,
-                "endpoint": url,
-                "params": params,
-                "rate_limits": rl_headers,
-            })
-        data = resp.json()
-        # Normalize: some APIs return arrays, others objects
-        jobs = data if isinstance(data, list) else data.get("results") or data.get("jobs") or data.get("data") or []
-        return {
+        })
+
+    if payload.freshness is not None:
+        local = await search_local_if_fresh(payload, provider, params)
+        if local is not None:
+            jobs, synced_at = local
+            duplicates = 0
+            if payload.dedup:
+                jobs, duplicates = await run_in_threadpool(dedup.collapse, jobs)
+                jobs = project_jobs(jobs, payload.fields)
+            if payload.stream:
+                stream_headers = {"X-Provider": provider, "X-Source": "local", "X-Synced-At": synced_at.isoformat()}
+                if payload.dedup:
+                    stream_headers["X-Duplicates"] = str(duplicates)
+                return ndjson_response(lambda: _iterate(jobs), stream_headers)
+            body = {
+                "jobs": jobs,
+                "count": len(jobs),
+                "provider": provider,
+                "source": "local",
+                "synced_at": synced_at.isoformat(),
+            }
+            if payload.dedup:
+                body["duplicates"] = duplicates
+            return FastJSONResponse(body)
+
+    if payload.stream:
+        return await stream_search(payload, provider, endpoint_path, url, headers, params)
+
+    if payload.max_results:
+        return FastJSONResponse(await search_all_pages(payload, provider, endpoint_path, url, headers, params))
+
+    result, cached = await cached_search(payload, provider, endpoint_path, url, headers, params)
+
+    async def build_body() -> Dict[str, Any]:
+        jobs = result["jobs"]
+        duplicates = 0
+        if payload.dedup:
+            # MinHash is pure Python (~200 ms for 500 jobs): keep it off the event loop
+            jobs, duplicates = await run_in_threadpool(dedup.collapse, jobs)
+        jobs = project_jobs(jobs, payload.fields)
+        body = {
             "jobs": jobs,
             "count": len(jobs),
-            "rate_limits": rl_headers,
+            "rate_limits": result["rate_limits"],
             "provider": provider,
+            "source": "cache" if cached else "upstream",
+            "cached": cached,
         }
-    except requests.RequestException as e:
-        raise HTTPException(status_code=502, detail={"message": "Network error", "error": str(e)})
+        if payload.dedup:
+            body["duplicates"] = duplicates
+        return body
+
+    if cached:
+        cache_key = cache.make_key(provider, endpoint_path, params)
+        variant = f"{','.join(payload.fields or ())}:{int(bool(payload.dedup))}"
+        return await cache_hit_response(build_body, cache_key, variant, accept_encoding)
+    # Returning a response directly skips FastAPI's jsonable_encoder pass
+    return FastJSONResponse(await build_body())
+
+
+async def federated_search(payload: SearchPayload) -> Response:
+    """
+    Search both providers concurrently and merge their jobs.
+
+    Each provider goes through the usual cache, coalescing and rate limits.
+    A provider that errors or exceeds its timeout is dropped and the
+    response is marked partial; if every provider fails, so does the search.
+    """
+    searches: Dict[str, Callable[[], Awaitable[Tuple[List[Any], List[Dict[str, Any]]]]]] = {}
+    for provider in federation.PROVIDERS:
+        api_key, api_host = provider_credentials(provider, payload)
+        if not api_key:
+            continue
+        endpoint_path, url, headers, params = provider_request(payload, provider, api_key, api_host)
+        searches[provider] = partial(_provider_jobs, payload, provider, endpoint_path, url, headers, params)
+
+    if not searches:
+        return FastJSONResponse({
+            "jobs": [],
+            "count": 0,
+            "note": "Add your API key to fetch live jobs.",
+            "provider": "federated",
+        })
+
+    results, errors = await federation.fan_out(searches, payload.provider_timeout or federation.PROVIDER_TIMEOUT)
+    if not results:
+        raise federation.all_failed(errors)
+    providers: Dict[str, Any] = {}
+    for name, (found, failed) in results.items():
+        providers[name] = {"status": "ok", "count": len(found)}
+        if failed:
+            providers[name].update(status="partial", failed_pages=failed)
+    providers.update(errors)
+    partial_results = any(info["status"] != "ok" for info in providers.values())
+    jobs, duplicates = federation.merge({name: found for name, (found, _) in results.items()})
+    if payload.dedup:
+        jobs, near_duplicates = await run_in_threadpool(dedup.collapse, jobs)
+        duplicates += near_duplicates
+    jobs = project_jobs(jobs, payload.fields)
+
+    if payload.stream:
+        return ndjson_response(
+            lambda: _iterate(jobs),
+            {"X-Provider": "federated", "X-Source": "upstream", "X-Partial": str(partial_results).lower()},
+        )
+    return FastJSONResponse({
+        "jobs": jobs,
+        "count": len(jobs),
+        "provider": "federated",
+        "source": "upstream",
+        "providers": providers,
+        "duplicates": duplicates,
+        "partial": partial_results,
+    })
+
+
+async def _provider_jobs(
+    payload: SearchPayload,
+    provider: str,
+    endpoint_path: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """One provider's jobs for a federated search, with any failed pages"""
+    if payload.max_results:
+        # Fields are projected after merging, which needs the full jobs
+        unprojected = payload.model_copy(update={"fields": None})
+        fetch_page, page_args, _ = _page_fetcher(unprojected, provider, endpoint_path, url, headers, params)
+        return await upstream.fetch_pages(fetch_page, **page_args)
+    result, _ = await cached_search(payload, provider, endpoint_path, url, headers, params)
+    return result["jobs"], []
+
+
+async def search_local_if_fresh(
+    payload: SearchPayload, provider: str, params: Dict[str, Any]
+) -> Optional[Tuple[List[dict], datetime]]:
+    """Answer a search from the local job store if its window was synced recently enough"""
+    if async_database.get_db() is None:
+        return None
+    query = job_store.local_query(provider, payload.time_window, params)
+    if query is None:
+        return None
+    synced_at = await job_store.window_synced_at(provider, payload.time_window)
+    if synced_at is None or datetime.now(timezone.utc) - synced_at > timedelta(seconds=payload.freshness):
+        return None
+    limit = payload.max_results or int(params.get("limit") or 20)
+    # Duplicates are matched on full jobs, so with dedup fields are projected afterwards
+    jobs = await job_store.search_local(
+        query, payload.time_window, limit=limit, offset=int(params.get("offset") or 0),
+        fields=None if payload.dedup else payload.fields,
+    )
+    return jobs, synced_at
+
+
+_background_tasks: Set["asyncio.Task[None]"] = set()
+
+
+# Jobs converted per event loop turn when compacting a cache entry
+COMPACT_CHUNK = 50
+
+
+async def compact_cache_entry(cache_key: str, provider: str, result: Dict[str, Any]):
+    """
+    Swap a fresh cache entry's provider dicts for compact Jobs.
+
+    Runs after the response that filled the entry has been rendered, in
+    small chunks that yield to the event loop in between (a worker thread
+    would only contend for the GIL while responses are being encoded).
+    """
+    raw_jobs = result["jobs"]
+    jobs: List[Any] = []
+    for start in range(0, len(raw_jobs), COMPACT_CHUNK):
+        await asyncio.sleep(0)
+        jobs.extend(job_model.from_provider_jobs(provider, raw_jobs[start:start + COMPACT_CHUNK]))
+    # Unless the entry was refreshed or evicted in the meantime
+    cache.search_cache.replace(cache_key, result, {**result, "jobs": jobs})
+
+
+async def cached_search(
+    payload: SearchPayload,
+    provider: str,
+    endpoint_path: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> Tuple[Dict[str, Any], bool]:
+    """Fetch one page of results through the cache, returning (result, cached)"""
+    cache_key = cache.make_key(provider, endpoint_path, params)
+    if not payload.no_cache:
+        cached = cache.search_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+
+    priority = payload.priority or "high"
+
+    async def fetch_and_cache(priority: str):
+        result = await upstream.fetch_jobs(url, headers, params, priority=priority)
+        job_store.enqueue_jobs(provider, result["jobs"])
+        ttl = cache.ttl_for_window("modified" if provider == "active" else payload.time_window)
+        # The leader and its waiters get the raw dicts (cheapest to encode);
+        # the cache entry is compacted to Jobs in the background. Uncached
+        # results (no TTL, too large) are never compacted: nobody reads them again
+        if cache.search_cache.set(cache_key, result, ttl=ttl, size=result["size"]):
+            task = asyncio.create_task(compact_cache_entry(cache_key, provider, result))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return result
+
+    # Identical concurrent searches share one upstream call, made at the
+    # priority of whoever started it
+    try:
+        result = await upstream.search_flights.do(cache_key, partial(fetch_and_cache, priority))
+    except HTTPException as e:
+        if priority == "low" or not ratelimit.refused(e, "low"):
+            raise
+        # A high-priority search that joined a low-priority call must not get
+        # its fast 429; it queues for the quota like any high-priority search
+        result = await upstream.search_flights.do(f"high:{cache_key}", partial(fetch_and_cache, "high"))
+    return result, False
+
+
+async def cache_hit_response(
+    build_body: Callable[[], Awaitable[Dict[str, Any]]],
+    cache_key: str,
+    variant: str,
+    accept_encoding: Optional[str],
+) -> Response:
+    """
+    Serve a cache hit, rendering and compressing its body once per encoding.
+
+    Every hit on the same entry renders the same body, so the encoded (and,
+    for compressing clients, compressed) bytes are kept as long as the
+    entry itself. `build_body` is only called when they are missing, so
+    repeat hits skip dedup, projection (Job.to_dict) and JSON encoding
+    entirely; compressed bodies go out with their Content-Encoding already
+    set and the middleware passes them through.
+    """
+    encoding = compression.negotiate(accept_encoding) or "identity"
+    # The same entry renders differently per projection/dedup variant, and
+    # a refreshed entry (new generation) must not be served an old body
+    generation = cache.search_cache.generation(cache_key)
+    key = f"{encoding}:{variant}:{generation}:{cache_key}"
+    rendered = compression.compressed_bodies.get(key)
+    if rendered is None:
+        content = fastjson.dumps(await build_body())
+        content_encoding = None
+        if encoding != "identity" and len(content) >= compression.MIN_SIZE:
+            content = await compression.compress(content, encoding)
+            content_encoding = encoding
+        rendered = (content, content_encoding)
+        compression.compressed_bodies.set(
+            key, rendered, ttl=cache.search_cache.ttl(cache_key), size=len(content)
+        )
+    content, content_encoding = rendered
+    headers = {"Vary": "Accept-Encoding"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content, media_type="application/json", headers=headers)
+
+
+def _page_fetcher(
+    payload: SearchPayload,
+    provider: str,
+    endpoint_path: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> Tuple[Callable[[int], Awaitable[List[Any]]], Dict[str, Any], Dict[str, str]]:
+    """Build the per-offset page fetcher used by fan-out pagination"""
+    # Use the largest page the provider accepts unless the client picked one
+    if "limit" not in payload.model_fields_set:
+        params["limit"] = PROVIDER_MAX_PAGE_SIZE
+    page_args = {
+        "start_offset": int(params.get("offset") or 0),
+        "page_size": int(params["limit"]),
+        "max_results": payload.max_results,
+        "concurrency": payload.page_concurrency or 4,
+    }
+    rate_limits: Dict[str, str] = {}
+
+    async def fetch_page(offset: int) -> List[Any]:
+        page_params = {**params, "offset": offset}
+        result, _ = await cached_search(payload, provider, endpoint_path, url, headers, page_params)
+        rate_limits.update(result["rate_limits"])
+        return project_jobs(result["jobs"], payload.fields)
+
+    return fetch_page, page_args, rate_limits
+
+
+async def search_all_pages(
+    payload: SearchPayload,
+    provider: str,
+    endpoint_path: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Fetch up to max_results jobs by fanning out over offset pages"""
+    # Duplicates are matched on full jobs, so with dedup fields are projected afterwards
+    fetch_payload = payload.model_copy(update={"fields": None}) if payload.dedup else payload
+    fetch_page, page_args, rate_limits = _page_fetcher(fetch_payload, provider, endpoint_path, url, headers, params)
+    jobs, failed = await upstream.fetch_pages(fetch_page, **page_args)
+    duplicates = 0
+    if payload.dedup:
+        jobs, duplicates = await run_in_threadpool(dedup.collapse, jobs)
+        jobs = project_jobs(jobs, payload.fields)
+    body = {
+        "jobs": jobs,
+        "count": len(jobs),
+        "rate_limits": rate_limits,
+        "provider": provider,
+        "source": "upstream",
+        "failed_pages": failed,
+        "partial": bool(failed),
+    }
+    if payload.dedup:
+        body["duplicates"] = duplicates
+    return body
+
+
+async def stream_search(
+    payload: SearchPayload,
+    provider: str,
+    endpoint_path: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> StreamingResponse:
+    """
+    Stream jobs to the client as NDJSON, one job per line.
+
+    A single page is parsed incrementally from the upstream body; with
+    max_results, pages are fetched concurrently and each is written out as
+    soon as it and all earlier pages are done. Errors after the response has
+    started are reported as a final {"error": ...} line.
+
+    Near-duplicates are only known once every job is in, so with dedup the
+    jobs are fetched in full, folded, and then written out.
+    """
+    response_headers = {"X-Provider": provider, "X-Source": "upstream"}
+
+    if payload.dedup:
+        if payload.max_results:
+            body = await search_all_pages(payload, provider, endpoint_path, url, headers, params)
+            errors = [{"error": failed} for failed in body["failed_pages"]]
+        else:
+            result, cached = await cached_search(payload, provider, endpoint_path, url, headers, params)
+            jobs, duplicates = await run_in_threadpool(dedup.collapse, result["jobs"])
+            body = {
+                "jobs": project_jobs(jobs, payload.fields),
+                "rate_limits": result["rate_limits"],
+                "source": "cache" if cached else "upstream",
+                "duplicates": duplicates,
+            }
+            errors = []
+        response_headers.update(body["rate_limits"])
+        response_headers.update({"X-Source": body["source"], "X-Duplicates": str(body["duplicates"])})
+        return ndjson_response(lambda: _iterate(body["jobs"] + errors), response_headers)
+
+    if payload.max_results:
+        fetch_page, page_args, _ = _page_fetcher(payload, provider, endpoint_path, url, headers, params)
+
+        async def jobs():
+            sent = 0
+            async for offset, page, exc in upstream.iter_pages(fetch_page, **page_args):
+                if exc is not None:
+                    yield {"error": {"offset": offset, "status": exc.status_code, "detail": exc.detail}}
+                    continue
+                for job in page[: payload.max_results - sent]:
+                    yield job
+                sent += len(page)
+
+    else:
+        cached = None
+        if not payload.no_cache:
+            cached = cache.search_cache.get(cache.make_key(provider, endpoint_path, params))
+        if cached is not None:
+            response_headers.update(cached["rate_limits"])
+            response_headers["X-Source"] = "cache"
+            jobs = partial(_iterate, project_jobs(cached["jobs"], payload.fields))
+
+        else:
+            resp, rl_headers = await upstream.open_job_stream(
+                url, headers, params, priority=payload.priority or "high"
+            )
+            response_headers.update(rl_headers)
+
+            async def jobs():
+                async for job in upstream.iter_stream_jobs(resp):
+                    job_store.enqueue_jobs(provider, (job,))
+                    yield project_job(job, payload.fields)
+
+            # Closes the upstream body even if the client disconnects mid-stream
+            return ndjson_response(jobs, response_headers, on_close=resp.aclose)
+
+    return ndjson_response(jobs, response_headers)
+
+
+async def _iterate(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+def ndjson_response(
+    jobs: Callable[[], AsyncIterator[Any]],
+    headers: Dict[str, str],
+    on_close: Optional[Callable[[], Awaitable[None]]] = None,
+) -> StreamingResponse:
+    """
+    Write the jobs produced by `jobs()` as NDJSON, ending with an error line on failure.
+
+    `on_close` runs once the response is over, whether it was sent in full
+    or the client disconnected.
+    """
+
+    async def ndjson():
+        try:
+            async for job in jobs():
+                yield fastjson.dumps(job) + b"\n"
+        except HTTPException as e:
+            yield fastjson.dumps({"error": {"status": e.status_code, "detail": e.detail}}) + b"\n"
+        except httpx.HTTPError as e:
+            yield fastjson.dumps({"error": {"status": 502, "detail": str(e)}}) + b"\n"
+        except fastjson.JSONDecodeError as e:
+            yield fastjson.dumps({"error": {"status": 502, "detail": f"Invalid JSON from upstream: {e}"}}) + b"\n"
+
+    background = BackgroundTask(on_close) if on_close is not None else None
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers=headers, background=background)
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return cache.search_cache.stats()
+
+
+@app.get("/api/upstream/stats")
+def upstream_stats():
+    return {
+        "singleflight": upstream.search_flights.stats(),
+        "rate_limits": ratelimit.stats(),
+        "job_store_writer": job_store.writer.stats(),
+        "dedup_index": dedup.job_index.stats(),
+    }
+
+
+@app.get("/api/compression/stats")
+def compression_stats():
+    return compression.stats()
+
+
+@app.get("/api/indexes")
+def index_report():
+    """Result of the last index bootstrap run"""
+    return indexes.last_report
 
 
 @app.get("/")
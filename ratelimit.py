@@ -0,0 +1,205 @@
+"""
+Upstream Rate Limiting
+
+Per-API-key token buckets driven by the x-ratelimit* headers RapidAPI sends
+back on every response. Outgoing requests are paced so we spend the paid
+quota steadily instead of bursting into upstream 429s:
+
+- short quota windows (per second/minute/hour) are paced to
+  remaining / seconds-until-reset
+- once a window is exhausted, requests are held until it resets
+- low-priority requests get a fast 429 with Retry-After instead of waiting,
+  and are refused early when the remaining quota drops below a reserve
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from fastapi import HTTPException
+
+MAX_RPS = float(os.getenv("UPSTREAM_MAX_RPS", 5))
+BURST = int(os.getenv("UPSTREAM_BURST", 10))
+# Longest a high-priority request may queue before giving up with a 429
+MAX_QUEUE_WAIT = float(os.getenv("UPSTREAM_MAX_QUEUE_WAIT", 10))
+# Fraction of the quota kept back for high-priority requests
+LOW_PRIORITY_RESERVE = float(os.getenv("UPSTREAM_LOW_PRIORITY_RESERVE", 0.2))
+# Windows longer than this (e.g. monthly plans) are not paced evenly
+PACING_HORIZON = float(os.getenv("UPSTREAM_PACING_HORIZON", 3600))
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _reset_seconds(value: Optional[str], now: float) -> Optional[float]:
+    """Reset headers are usually seconds-until-reset, sometimes an epoch"""
+    reset = _parse_number(value)
+    if reset is None:
+        return None
+    if reset > 1_000_000_000:
+        reset -= now
+    return max(reset, 0.0)
+
+
+def parse_quota(headers: Mapping[str, str]) -> Optional[Tuple[float, Optional[float], Optional[float]]]:
+    """
+    Pick the request quota out of lowercased rate limit headers.
+
+    Returns (remaining, limit, seconds_until_reset) for the most constrained
+    request quota, or None when the response carried no usable quota.
+    """
+    now = time.time()
+    best = None
+    for key, value in headers.items():
+        if not key.endswith("remaining"):
+            continue
+        prefix = key[: -len("remaining")]
+        # Job-count quotas are tracked upstream per job, not per request
+        if "jobs" in prefix:
+            continue
+        remaining = _parse_number(value)
+        if remaining is None:
+            continue
+        limit = _parse_number(headers.get(prefix + "limit"))
+        reset = _reset_seconds(headers.get(prefix + "reset"), now)
+        if best is None or remaining < best[0]:
+            best = (remaining, limit, reset)
+    return best
+
+
+class KeyLimiter:
+    """Token bucket for a single API key"""
+
+    def __init__(self, rate: float = MAX_RPS, capacity: int = BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.remaining: Optional[float] = None
+        self.limit: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float, priority: str) -> float:
+        """Seconds until a request of this priority may go out (0 = now)"""
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if (
+            priority == "low"
+            and self.remaining is not None
+            and self.limit
+            and self.remaining < self.limit * LOW_PRIORITY_RESERVE
+        ):
+            return max((self.reset_at or now) - now, 1.0)
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    def observe(self, rl_headers: Mapping[str, str], status_code: int, retry_after: Optional[str] = None):
+        """Update the bucket from the headers of an upstream response"""
+        now = time.monotonic()
+        quota = parse_quota(rl_headers)
+        if quota is not None:
+            remaining, limit, reset = quota
+            self.remaining, self.limit = remaining, limit
+            self.reset_at = now + reset if reset is not None else None
+            if remaining <= 0 and reset is not None:
+                self.blocked_until = now + reset
+            elif reset and reset <= PACING_HORIZON:
+                # Spread what is left evenly over the rest of the window
+                self.rate = min(MAX_RPS, remaining / reset)
+                self.tokens = min(self.tokens, remaining)
+            else:
+                self.rate = MAX_RPS
+        if status_code == 429:
+            wait = _parse_number(retry_after)
+            if wait is None and self.reset_at is not None:
+                wait = self.reset_at - now
+            self.blocked_until = max(self.blocked_until, now + (wait if wait is not None else 1.0))
+            self.tokens = 0.0
+            self.updated = now
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "rate": round(self.rate, 4),
+            "tokens": round(min(self.capacity, self.tokens + (now - self.updated) * self.rate), 2),
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "blocked_for": round(max(self.blocked_until - now, 0.0), 2),
+            "throttled": self.throttled,
+        }
+
+
+_limiters: Dict[str, KeyLimiter] = {}
+
+
+def get_limiter(api_key: str) -> KeyLimiter:
+    limiter = _limiters.get(api_key)
+    if limiter is None:
+        limiter = _limiters[api_key] = KeyLimiter()
+    return limiter
+
+
+async def acquire(api_key: str, priority: str = "high"):
+    """
+    Wait for permission to send one upstream request for this key.
+
+    Low-priority requests never queue; high-priority requests queue for up to
+    UPSTREAM_MAX_QUEUE_WAIT seconds. Either way a request that cannot go out
+    in time fails fast with 429 and a Retry-After header.
+    """
+    limiter = get_limiter(api_key)
+    waited = 0.0
+    while True:
+        wait = limiter.delay(time.monotonic(), priority)
+        if wait <= 0:
+            limiter.consume()
+            return
+        if priority == "low" or waited + wait > MAX_QUEUE_WAIT:
+            limiter.throttled += 1
+            retry_after = max(1, math.ceil(wait))
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "message": "Upstream rate limit reached, retry later",
+                    "retry_after": retry_after,
+                    "priority": priority,
+                },
+                headers={"Retry-After": str(retry_after)},
+            )
+        await asyncio.sleep(wait)
+        waited += wait
+
+
+def refused(exc: Exception, priority: Optional[str] = None) -> bool:
+    """Whether an exception is acquire()'s own 429 (for a request of `priority`, if given)"""
+    return (
+        isinstance(exc, HTTPException)
+        and exc.status_code == 429
+        and isinstance(exc.detail, dict)
+        and "retry_after" in exc.detail
+        and (priority is None or exc.detail.get("priority") == priority)
+    )
+
+
+def stats() -> Dict[str, Any]:
+    # Never echo full API keys back
+    return {f"...{key[-4:]}": limiter.stats() for key, limiter in _limiters.items()}
@@ -5,8 +5,14 @@ This file contains example schemas and patterns for typical applications.
 Copy and modify these examples for your specific needs.
 """
 
+import os
 from datetime import datetime
-from database import create_document, get_documents, update_document, delete_document
+from bson import ObjectId
+from database import (
+    BatchWriter, create_document, create_documents, get_documents, update_document, delete_document,
+    get_counter, increment_counter, increment_counter_later, next_reference,
+)
+from indexes import ANALYTICS_TIMESERIES, ensure_timeseries_collections
 
 # =============================================================================
 # USER MANAGEMENT SCHEMA
@@ -51,14 +57,61 @@ def create_blog_post(title: str, content: str, author_id: str, tags: list = None
         "status": "draft",
         "view_count": 0,
         "likes": 0,
-        "comments": []
+        "comment_count": 0
     }
     return create_document("posts", post_data)
 
+# Comments live in fixed-size bucket documents ("post_comment_buckets"), not
+# in the post itself, so a post stays the same size however many comments it
+# gets. The post only keeps a comment_count, which hands each new comment its
+# position; the position decides the bucket and is stored on the comment, so
+# pages are ordered by it rather than by when a write reached its bucket.
+COMMENTS_PER_BUCKET = 100
+
+def _reserve_comment_positions(db, post_id: str, count: int):
+    """
+    Reserve `count` positions on a post, returning (first position, legacy
+    comments) or None if there is no such post.
+
+    Posts from before comment buckets embed their comments in a `comments`
+    array and have no comment_count. The same atomic update takes that
+    array off the post and reserves positions for it ahead of the new ones.
+    """
+    from pymongo import ReturnDocument
+
+    post = db.posts.find_one_and_update(
+        {"_id": ObjectId(post_id)},
+        [
+            {"$set": {"comment_count": {"$add": [
+                {"$ifNull": ["$comment_count", 0]}, count, {"$size": {"$ifNull": ["$comments", []]}},
+            ]}}},
+            {"$project": {"comments": 0}},
+        ],
+        projection={"comment_count": 1, "comments": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if post is None:
+        return None
+    return post.get("comment_count") or 0, post.get("comments") or []
+
+def _store_comments(db, post_id: str, first_position: int, comments: list):
+    """Store comments at consecutive positions from first_position"""
+    by_bucket = {}
+    for position, comment in enumerate(comments, first_position):
+        by_bucket.setdefault(position // COMMENTS_PER_BUCKET, []).append({**comment, "position": position})
+    for bucket, bucket_comments in by_bucket.items():
+        db.post_comment_buckets.update_one(
+            {"post_id": post_id, "bucket": bucket},
+            {
+                "$push": {"comments": {"$each": bucket_comments}},
+                "$inc": {"count": len(bucket_comments)},
+                "$setOnInsert": {"created_at": bucket_comments[0].get("created_at") or datetime.utcnow()}
+            },
+            upsert=True
+        )
+
 def add_comment_to_post(post_id: str, author_id: str, comment_text: str):
     """Add comment to a blog post"""
-    from bson import ObjectId
-    
     comment = {
         "id": str(ObjectId()),
         "author_id": author_id,
@@ -66,14 +119,73 @@ def add_comment_to_post(post_id: str, author_id: str, comment_text: str):
         "created_at": datetime.utcnow(),
         "likes": 0
     }
-    
-    # Add comment to post's comments array
+
     from database import db
-    result = db.posts.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$push": {"comments": comment}}
-    )
-    return result.modified_count > 0
+    reserved = _reserve_comment_positions(db, post_id, 1)
+    if reserved is None:
+        return False
+    first_position, legacy = reserved
+    _store_comments(db, post_id, first_position, [*legacy, comment])
+    return True
+
+def migrate_post_comments():
+    """Move every post's embedded comments array into comment buckets"""
+    from database import db
+
+    migrated = 0
+    for post in db.posts.find({"comments": {"$exists": True}}, {"_id": 1}):
+        reserved = _reserve_comment_positions(db, str(post["_id"]), 0)
+        if reserved and reserved[1]:
+            _store_comments(db, str(post["_id"]), *reserved)
+            migrated += 1
+    return migrated
+
+def get_post_comments(post_id: str, skip: int = 0, limit: int = 20):
+    """Get a page of a post's comments, oldest first"""
+    from database import db
+
+    buckets = db.post_comment_buckets.find(
+        {"post_id": post_id, "bucket": {"$gte": skip // COMMENTS_PER_BUCKET}},
+        {"_id": 0, "bucket": 1, "comments": 1}
+    ).sort("bucket", 1)
+
+    page = []
+    found = False
+    for bucket in buckets:
+        found = True
+        for index, comment in enumerate(bucket["comments"]):
+            # Comments bucketed before positions were stored: push order
+            position = comment.get("position", bucket["bucket"] * COMMENTS_PER_BUCKET + index)
+            if position >= skip:
+                page.append((position, comment))
+        # Later buckets only hold later positions
+        if len(page) >= limit:
+            break
+    if not found:
+        # A post nobody has commented on since comment buckets
+        post = db.posts.find_one(
+            {"_id": ObjectId(post_id)}, {"_id": 0, "comment_count": 1, "comments": {"$slice": [skip, limit]}}
+        )
+        return (post or {}).get("comments") or []
+
+    page.sort(key=lambda item: item[0])
+    return [comment for _, comment in page[:limit]]
+
+def record_post_view(post_id: str, hot: bool = False):
+    """Count a view; increments are coalesced in memory and flushed in bulk"""
+    # Hot posts spread their increments over sharded counter documents
+    return increment_counter_later("posts", post_id, "view_count", sharded=hot)
+
+def like_post(post_id: str, hot: bool = False):
+    """Atomically add a like to a post"""
+    increment_counter("posts", post_id, "likes", sharded=hot)
+
+def get_post_stats(post_id: str):
+    """View and like counts, including any sharded increments"""
+    return {
+        "view_count": get_counter("posts", post_id, "view_count"),
+        "likes": get_counter("posts", post_id, "likes")
+    }
 
 # =============================================================================
 # E-COMMERCE SCHEMA
@@ -86,7 +198,7 @@ def create_product(name: str, price: float, description: str, category: str):
         "price": price,
         "description": description,
         "category": category,
-        "sku": f"PROD-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "sku": next_reference("PROD"),
         "inventory": {
             "stock": 0,
             "reserved": 0,
@@ -97,18 +209,36 @@ def create_product(name: str, price: float, description: str, category: str):
         "status": "active",
         "rating": {
             "average": 0.0,
-            "count": 0
+            "count": 0,
+            "total": 0.0
         }
     }
     return create_document("products", product_data)
 
+def rate_product(product_id: str, rating: float):
+    """Add a rating and recompute the average in one atomic update"""
+    from bson import ObjectId
+    from database import db
+
+    result = db.products.update_one(
+        {"_id": ObjectId(product_id)},
+        [
+            {"$set": {
+                "rating.count": {"$add": [{"$ifNull": ["$rating.count", 0]}, 1]},
+                "rating.total": {"$add": [{"$ifNull": ["$rating.total", 0]}, rating]}
+            }},
+            {"$set": {"rating.average": {"$divide": ["$rating.total", "$rating.count"]}}}
+        ]
+    )
+    return result.modified_count > 0
+
 def create_order(user_id: str, items: list, shipping_address: dict):
     """Create an order"""
     total_amount = sum(item["price"] * item["quantity"] for item in items)
     
     order_data = {
         "user_id": user_id,
-        "order_number": f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "order_number": next_reference("ORD"),
         "items": items,
         "total_amount": total_amount,
         "shipping_address": shipping_address,
@@ -235,7 +365,7 @@ def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1):
         "event_id": event_id,
         "user_id": user_id,
         "ticket_quantity": ticket_quantity,
-        "booking_reference": f"BOOK-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "booking_reference": next_reference("BOOK"),
         "status": "confirmed",  # pending, confirmed, cancelled
         "payment": {
             "amount": 0.0,
@@ -251,6 +381,98 @@ def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1):
 # ANALYTICS/TRACKING SCHEMA
 # =============================================================================
 
+# Events are buffered in memory and written behind the caller's back with
+# insert_many, so tracking never waits on Mongo. Ids are assigned up front so
+# the helpers can still return them.
+#
+# With ANALYTICS_TIMESERIES=true the event collections are created as MongoDB
+# time-series collections (see TIMESERIES_COLLECTIONS in indexes.py). Each
+# flush also folds page views into per-minute and per-hour counts in
+# "page_view_rollups", so dashboards never scan raw events.
+
+ROLLUP_GRANULARITIES = {
+    "minute": lambda ts: ts.replace(second=0, microsecond=0),
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+}
+
+_timeseries_ready = False
+
+def _ensure_timeseries():
+    global _timeseries_ready
+    if not _timeseries_ready:
+        ensure_timeseries_collections()
+        _timeseries_ready = True
+
+def _update_page_view_rollups(events: list):
+    """Add a batch of page views to the per-minute/per-hour rollup counts"""
+    from pymongo import UpdateOne
+    from database import db
+
+    counts = {}
+    for event in events:
+        for granularity, truncate in ROLLUP_GRANULARITIES.items():
+            key = (event["page_path"], granularity, truncate(event["timestamp"]))
+            counts[key] = counts.get(key, 0) + 1
+
+    ops = [
+        UpdateOne(
+            {"page_path": page_path, "granularity": granularity, "bucket": bucket},
+            {"$inc": {"count": count}},
+            upsert=True,
+        )
+        for (page_path, granularity, bucket), count in counts.items()
+    ]
+    if ops:
+        db.page_view_rollups.bulk_write(ops, ordered=False)
+
+def _flush_events(batch: list):
+    """Write a batch of buffered events, one insert_many per collection"""
+    if ANALYTICS_TIMESERIES:
+        _ensure_timeseries()
+    by_collection = {}
+    for collection, event in batch:
+        by_collection.setdefault(collection, []).append(event)
+    for collection, events in by_collection.items():
+        create_documents(collection, events)
+    if "page_views" in by_collection:
+        _update_page_view_rollups(by_collection["page_views"])
+
+analytics_writer = BatchWriter(
+    _flush_events,
+    batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 1.0)),
+    max_queue=int(os.getenv("ANALYTICS_QUEUE_SIZE", 100_000)),
+    policy=os.getenv("ANALYTICS_QUEUE_POLICY", "drop"),  # drop | block
+    name="analytics-writer",
+)
+
+def _record_event(collection: str, event: dict):
+    """Queue an event for writing; returns its id, or None if it was dropped"""
+    event["_id"] = ObjectId()
+    if not analytics_writer.submit((collection, event)):
+        return None
+    return str(event["_id"])
+
+def flush_analytics():
+    """Write out all buffered events (call on shutdown)"""
+    analytics_writer.close()
+
+def analytics_stats():
+    """Queue depth, drops and flush latency of the analytics writer"""
+    return analytics_writer.stats()
+
+def get_page_view_counts(page_path: str, granularity: str = "hour", since: datetime = None):
+    """Pre-aggregated page view counts per minute or hour, oldest first"""
+    from database import db
+
+    query = {"page_path": page_path, "granularity": granularity}
+    if since is not None:
+        query["bucket"] = {"$gte": since}
+    return [
+        {"bucket": doc["bucket"], "count": doc["count"]}
+        for doc in db.page_view_rollups.find(query, {"_id": 0}).sort("bucket", 1)
+    ]
+
 def track_user_activity(user_id: str, action: str, resource_type: str, resource_id: str, metadata: dict = None):
     """Track user activity for analytics"""
     activity_data = {
@@ -264,7 +486,7 @@ def track_user_activity(user_id: str, action: str, resource_type: str, resource_
         "session_id": None,
         "timestamp": datetime.utcnow()
     }
-    return create_document("user_activities", activity_data)
+    return _record_event("user_activities", activity_data)
 
 def track_page_view(page_path: str, user_id: str = None, session_id: str = None):
     """Track page views for analytics"""
@@ -284,7 +506,7 @@ def track_page_view(page_path: str, user_id: str = None, session_id: str = None)
         },
         "timestamp": datetime.utcnow()
     }
-    return create_document("page_views", pageview_data)
+    return _record_event("page_views", pageview_data)
 
 # =============================================================================
 # NOTIFICATION SCHEMA
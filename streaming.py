@@ -0,0 +1,115 @@
+"""
+Incremental Job Parsing
+
+Splits the job array out of an upstream JSON body as the bytes arrive, so
+jobs can be streamed to the client without holding the whole body (or the
+whole parsed list) in memory. Handles bodies that are a bare array and
+bodies that wrap the array in an object under "results", "jobs" or "data".
+"""
+
+import re
+from typing import List
+
+# Characters that matter to the splitter outside of strings
+_STRUCTURAL = re.compile(rb'["\[\]{},:]')
+
+_ARRAY_KEYS = (b"results", b"jobs", b"data")
+
+
+class JobArraySplitter:
+    """Feed body chunks in, get raw JSON bytes of each array element out"""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_string = b""
+        self._key = b""
+        self._top_is_object = False
+        # Depth of the job array once found, -1 after it has been closed
+        self._array_depth = None
+        self._segment_start = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        buf = self._buf
+        buf.extend(chunk)
+        out: List[bytes] = []
+        i = self._pos
+        end = len(buf)
+
+        while i < end:
+            if self._in_string:
+                j = buf.find(b'"', i)
+                if j == -1:
+                    i = end
+                    break
+                # A quote preceded by an odd number of backslashes is escaped
+                k = j - 1
+                while k >= 0 and buf[k] == 0x5C:
+                    k -= 1
+                if (j - 1 - k) % 2 == 1:
+                    i = j + 1
+                    continue
+                self._in_string = False
+                if self._depth == 1:
+                    self._last_string = bytes(buf[self._string_start:j])
+                i = j + 1
+                continue
+
+            match = _STRUCTURAL.search(buf, i)
+            if match is None:
+                i = end
+                break
+            i = match.start()
+            c = buf[i]
+            collecting = self._array_depth is not None and self._array_depth > 0
+
+            if c == 0x22:  # "
+                self._in_string = True
+                self._string_start = i + 1
+            elif c == 0x3A:  # :
+                if self._depth == 1:
+                    self._key = self._last_string
+            elif c == 0x2C:  # ,
+                if collecting and self._depth == self._array_depth:
+                    self._emit(out, i)
+            elif c in (0x5B, 0x7B):  # [ {
+                self._depth += 1
+                if self._depth == 1 and c == 0x7B:
+                    self._top_is_object = True
+                if self._array_depth is None and c == 0x5B and (
+                    self._depth == 1
+                    or (self._depth == 2 and self._top_is_object and self._key in _ARRAY_KEYS)
+                ):
+                    self._array_depth = self._depth
+                    self._segment_start = i + 1
+            else:  # ] }
+                if collecting and self._depth == self._array_depth:
+                    self._emit(out, i)
+                    self._array_depth = -1
+                self._depth -= 1
+            i += 1
+
+        self._compact(i)
+        return out
+
+    def _emit(self, out: List[bytes], i: int):
+        element = bytes(self._buf[self._segment_start:i]).strip()
+        if element:
+            out.append(element)
+        self._segment_start = i + 1
+
+    def _compact(self, i: int):
+        """Drop bytes that no pending element or string still needs"""
+        keep = i
+        if self._array_depth is not None and self._array_depth > 0:
+            keep = min(keep, self._segment_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if keep:
+            del self._buf[:keep]
+            self._segment_start -= keep
+            self._string_start -= keep
+        self._pos = i - keep
@@ -0,0 +1,259 @@
+"""
+Incremental Job Sync
+
+Background scheduler that turns the paid API into a change feed for the
+local job store instead of querying it on every user request:
+
+- `hourly` pulls newly indexed jobs and upserts them
+- `modified` pulls jobs changed in the last 24h and upserts them
+- `expired` pulls jobs that expired in the last 24h and soft-deletes them
+
+Progress is checkpointed per page in `job_syncs`, so a restarted worker
+resumes an interrupted run at the page it stopped at. Each window is
+claimed with a short lease, so several app workers (or a separate sync
+process) never sync the same window at once.
+
+Run it in-process with JOB_SYNC_ENABLED=true, or on its own with:
+
+    python sync_worker.py          # run forever
+    python sync_worker.py --once   # sync every due window once and exit
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import database
+import dedup
+import indexes
+import job_store
+import upstream
+
+logger = logging.getLogger(__name__)
+
+PROVIDER = "fantastic"
+PAGE_SIZE = int(os.getenv("JOB_SYNC_PAGE_SIZE", 100))
+LEASE_SECONDS = int(os.getenv("JOB_SYNC_LEASE_SECONDS", 300))
+TICK_SECONDS = int(os.getenv("JOB_SYNC_TICK_SECONDS", 60))
+
+# Seconds between runs for each synced window. The hourly feed only reaches
+# an hour back, so it has to run more often than that to leave no gaps.
+SYNC_INTERVALS = {
+    "hourly": int(os.getenv("JOB_SYNC_HOURLY_INTERVAL", 45 * 60)),
+    "modified": int(os.getenv("JOB_SYNC_MODIFIED_INTERVAL", 6 * 3600)),
+    "expired": int(os.getenv("JOB_SYNC_EXPIRED_INTERVAL", 6 * 3600)),
+}
+
+# Windows the hourly feed fills in once it has run without gaps for their span
+DERIVED_WINDOWS = ("24h", "7d", "backfill")
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # Mongo hands datetimes back naive (UTC)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def claim_window(window: str) -> Optional[Dict[str, Any]]:
+    """
+    Take the lease on a window if it is due, returning its checkpoint.
+
+    Returns None when the window was synced recently or another worker
+    currently holds the lease.
+    """
+    now = _now()
+    due_before = now - timedelta(seconds=SYNC_INTERVALS[window])
+    try:
+        return database.db[job_store.SYNCS_COLLECTION].find_one_and_update(
+            {
+                "_id": f"{PROVIDER}:{window}",
+                "$and": [
+                    {"$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}]},
+                    # Interrupted runs (offset set) are always due
+                    {"$or": [
+                        {"synced_at": {"$exists": False}},
+                        {"synced_at": {"$lt": due_before}},
+                        {"offset": {"$gt": 0}},
+                    ]},
+                ],
+            },
+            {
+                "$set": {
+                    "provider": PROVIDER,
+                    "window": window,
+                    "lease_owner": WORKER_ID,
+                    "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                },
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The checkpoint exists but doesn't match: not due, or leased elsewhere
+        return None
+
+
+def save_checkpoint(window: str, fields: Dict[str, Any]):
+    """Persist run progress and renew the lease"""
+    fields = {**fields, "lease_until": _now() + timedelta(seconds=LEASE_SECONDS)}
+    database.db[job_store.SYNCS_COLLECTION].update_one(
+        {"_id": f"{PROVIDER}:{window}", "lease_owner": WORKER_ID},
+        {"$set": fields},
+    )
+
+
+def finish_run(window: str, checkpoint: Dict[str, Any], run_started_at: datetime):
+    """Mark a window synced, release its lease and update derived windows"""
+    now = _now()
+    fields: Dict[str, Any] = {
+        "synced_at": now,
+        "offset": 0,
+        "run_started_at": None,
+        "last_run_started_at": run_started_at,
+    }
+    unset = {"lease_owner": "", "lease_until": ""}
+
+    if window == "hourly":
+        # This run saw everything created since run_started_at - span; the
+        # history stays continuous as long as that reaches back to the
+        # previous run's start
+        _, feed_span = job_store.WINDOW_SPANS["hourly"]
+        previous_start = _aware(checkpoint.get("last_run_started_at"))
+        covered_since = _aware(checkpoint.get("covered_since"))
+        if covered_since is None or previous_start is None or run_started_at - feed_span > previous_start:
+            covered_since = run_started_at - feed_span
+        fields["covered_since"] = covered_since
+        for derived in DERIVED_WINDOWS:
+            _, span = job_store.WINDOW_SPANS[derived]
+            if covered_since <= now - span:
+                job_store.mark_window_synced(PROVIDER, derived, now)
+
+    database.db[job_store.SYNCS_COLLECTION].update_one(
+        {"_id": f"{PROVIDER}:{window}", "lease_owner": WORKER_ID},
+        {"$set": fields, "$unset": unset},
+    )
+
+
+def release_window(window: str):
+    """Give up the lease but keep the checkpoint, so the next run resumes"""
+    database.db[job_store.SYNCS_COLLECTION].update_one(
+        {"_id": f"{PROVIDER}:{window}", "lease_owner": WORKER_ID},
+        {"$unset": {"lease_owner": "", "lease_until": ""}},
+    )
+
+
+def soft_delete_jobs(items: List[Any]) -> int:
+    """Flag expired jobs instead of deleting them"""
+    ids = [str(item) if not isinstance(item, dict) else job_store.job_key(item) for item in items]
+    ids = [job_id for job_id in ids if job_id]
+    if not ids:
+        return 0
+    now = _now()
+    result = database.db[job_store.JOBS_COLLECTION].update_many(
+        {"provider": PROVIDER, "job_id": {"$in": ids}},
+        {"$set": {"expired": True, "expired_at": now, "updated_at": now}},
+    )
+    return result.modified_count
+
+
+async def sync_window(window: str, checkpoint: Dict[str, Any]) -> int:
+    """Page through one window from its checkpoint, returning jobs applied"""
+    api_key = os.getenv("FANTASTIC_RAPIDAPI_KEY")
+    api_host = os.getenv("FANTASTIC_RAPIDAPI_HOST", "fantastic.p.rapidapi.com")
+    url = f"https://{api_host}{upstream.get_endpoint_path_fantastic(window)}"
+    headers = {"X-RapidAPI-Key": api_key, "X-RapidAPI-Host": api_host, "Accept": "application/json"}
+
+    # Resume an interrupted run, unless it is too old to still be contiguous
+    offset = int(checkpoint.get("offset") or 0)
+    run_started_at = _aware(checkpoint.get("run_started_at"))
+    if not offset or run_started_at is None or _now() - run_started_at > timedelta(hours=1):
+        offset = 0
+        run_started_at = _now()
+    await asyncio.to_thread(save_checkpoint, window, {"run_started_at": run_started_at, "offset": offset})
+
+    applied = 0
+    while True:
+        params = {"limit": PAGE_SIZE, "offset": offset, "description_type": "text"}
+        # Background syncs yield to user traffic when quota runs low
+        result = await upstream.fetch_jobs(url, headers, params, priority="low")
+        jobs = result["jobs"]
+        if window == "expired":
+            applied += await asyncio.to_thread(soft_delete_jobs, jobs)
+        elif jobs:
+            applied += await asyncio.to_thread(job_store.write_jobs, PROVIDER, jobs)
+        offset += len(jobs)
+        if len(jobs) < PAGE_SIZE:
+            break
+        await asyncio.to_thread(save_checkpoint, window, {"offset": offset})
+
+    await asyncio.to_thread(finish_run, window, checkpoint, run_started_at)
+    return applied
+
+
+async def run_once() -> Dict[str, int]:
+    """Sync every window that is due, returning jobs applied per window"""
+    applied: Dict[str, int] = {}
+    for window in SYNC_INTERVALS:
+        checkpoint = await asyncio.to_thread(claim_window, window)
+        if checkpoint is None:
+            continue
+        try:
+            applied[window] = await sync_window(window, checkpoint)
+            logger.info("job sync: %s applied %d jobs", window, applied[window])
+        except HTTPException as e:
+            logger.warning("job sync: %s stopped with upstream status %s", window, e.status_code)
+        finally:
+            if window not in applied:
+                # Progress so far is checkpointed; the next tick resumes from there
+                await asyncio.to_thread(release_window, window)
+    return applied
+
+
+async def run_forever():
+    """Scheduler loop for in-process or standalone use"""
+    if database.db is None or not os.getenv("FANTASTIC_RAPIDAPI_KEY"):
+        logger.warning("job sync disabled: database or FANTASTIC_RAPIDAPI_KEY not configured")
+        return
+    await asyncio.to_thread(indexes.ensure_indexes)
+    while True:
+        try:
+            await run_once()
+        except Exception:
+            logger.exception("job sync tick failed")
+        await asyncio.sleep(TICK_SECONDS)
+
+
+async def _main(once: bool):
+    database.connect()
+    await upstream.startup()
+    if dedup.JOB_DEDUP_ENABLED and database.db is not None:
+        await asyncio.to_thread(job_store.load_dedup_index)
+    try:
+        if once:
+            print(await run_once())
+        else:
+            await run_forever()
+    finally:
+        await upstream.shutdown()
+        database.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main("--once" in sys.argv))
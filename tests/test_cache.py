@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+
+import cache
+import main
+import upstream
+from cache import TTLCache
+from job_model import Job
+
+
+def test_set_bumps_generation_and_replace_keeps_it():
+    c = TTLCache(max_bytes=1000)
+    c.set("k", "v0", ttl=60, size=1)
+    first = c.generation("k")
+    c.replace("k", "v0", "v0-compact")
+    assert c.get("k") == "v0-compact"
+    assert c.generation("k") == first
+
+    c.set("k", "v1", ttl=60, size=1)
+    assert c.generation("k") != first
+    # A stale replace (entry refreshed meanwhile) is ignored
+    c.replace("k", "v0", "stale")
+    assert c.get("k") == "v1"
+    assert c.generation("missing") is None
+
+
+def test_set_reports_whether_it_stored():
+    c = TTLCache(max_bytes=10)
+    assert c.set("k", "v", ttl=60, size=5)
+    assert not c.set("big", "v", ttl=60, size=11)
+    assert not c.set("expired", "v", ttl=0, size=1)
+    assert c.get("big") is None and c.get("expired") is None
+
+
+def compactions_after_search(monkeypatch, search_cache: TTLCache):
+    async def handler(request):
+        return httpx.Response(200, json={"jobs": [{"id": 1, "title": "Data Engineer"}]})
+
+    monkeypatch.setattr(upstream, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(cache, "search_cache", search_cache)
+    payload = main.SearchPayload(api_key="k")
+
+    async def run():
+        await main.search_jobs(payload, accept_encoding=None)
+        scheduled = len(main._background_tasks)
+        await asyncio.gather(*main._background_tasks)
+        return scheduled
+
+    return asyncio.run(run())
+
+
+def test_stored_entry_is_compacted(monkeypatch):
+    search_cache = TTLCache(max_bytes=1 << 20)
+    assert compactions_after_search(monkeypatch, search_cache) == 1
+    (entry,) = (value for _, _, value, _ in search_cache._data.values())
+    assert isinstance(entry["jobs"][0], Job)
+
+
+def test_uncached_result_is_not_compacted(monkeypatch):
+    assert compactions_after_search(monkeypatch, TTLCache(max_bytes=1)) == 0
@@ -0,0 +1,81 @@
+import asyncio
+import gzip
+import zlib
+
+from starlette.responses import Response, StreamingResponse
+
+import cache
+import compression
+import main
+
+
+def call(app, accept_encoding="gzip"):
+    """Run an ASGI app once, returning (start message, body messages)"""
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(compression.CompressionMiddleware(app)(scope, receive, send))
+    return messages[0], messages[1:]
+
+
+def headers(start):
+    return {key.decode(): value.decode() for key, value in start["headers"]}
+
+
+def test_small_body_passes_through():
+    start, body = call(Response(b'{"ok": true}', media_type="application/json"))
+    assert "content-encoding" not in headers(start)
+    assert body[0]["body"] == b'{"ok": true}'
+
+
+def test_large_body_is_compressed():
+    content = b'{"jobs": "' + b"x" * 5000 + b'"}'
+    start, body = call(Response(content, media_type="application/json"))
+    assert headers(start)["content-encoding"] == "gzip"
+    assert int(headers(start)["content-length"]) == len(body[0]["body"])
+    assert gzip.decompress(body[0]["body"]) == content
+
+
+def test_ndjson_chunks_decompress_as_they_arrive():
+    lines = [b'{"id": %d}\n' % n for n in range(3)]
+
+    async def chunks():
+        for line in lines:
+            yield line
+
+    start, body = call(StreamingResponse(chunks(), media_type="application/x-ndjson"))
+    assert headers(start)["content-encoding"] == "gzip"
+    assert "content-length" not in headers(start)
+    decompressor = zlib.decompressobj(31)
+    received = [decompressor.decompress(message["body"]) for message in body if message["body"]]
+    # Every line can be read before the next one is sent
+    assert received[:3] == lines
+
+
+def test_pre_encoded_response_passes_through_untouched():
+    content = gzip.compress(b"x" * 5000)
+    start, body = call(Response(content, media_type="application/json", headers={"Content-Encoding": "gzip"}))
+    assert headers(start)["content-encoding"] == "gzip"
+    assert body[0]["body"] == content
+
+
+def test_repeat_cache_hits_skip_building_the_body():
+    cache.search_cache.set("test:hit", {"jobs": []}, ttl=60, size=1)
+    built = []
+
+    async def build_body():
+        built.append(1)
+        return {"jobs": ["x" * 5000]}
+
+    async def hits():
+        return [await main.cache_hit_response(build_body, "test:hit", "", "gzip") for _ in range(2)]
+
+    first, repeat = asyncio.run(hits())
+    assert len(built) == 1
+    assert first.body == repeat.body and repeat.headers["content-encoding"] == "gzip"
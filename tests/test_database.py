@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import async_database  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.mark.parametrize("limit, expected", [(None, 25), (0, 25), (7, 7)])
+def test_iter_documents_limit(monkeypatch, limit, expected):
+    monkeypatch.setattr(database, "_db", mongomock.MongoClient()["iter_test"])
+    database.db["items"].insert_many([{"n": n} for n in range(25)])
+    assert len(list(database.iter_documents("items", limit=limit, batch_size=10))) == expected
+
+
+@pytest.mark.parametrize("limit, expected", [(None, 25), (0, 25), (7, 7)])
+def test_async_iter_documents_limit(monkeypatch, limit, expected):
+    monkeypatch.setattr(async_database, "db", mongomock_motor.AsyncMongoMockClient()["iter_test"])
+
+    async def run():
+        await async_database.db["items"].insert_many([{"n": n} for n in range(25)])
+        return [doc async for doc in async_database.iter_documents("items", limit=limit, batch_size=10)]
+
+    assert len(asyncio.run(run())) == expected
@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+import cache
+import dedup
+import main
+import upstream
+from job_model import Job
+
+DESCRIPTION = "Build and run data pipelines for the analytics team " * 20
+
+
+def raw_job(job_id, **fields):
+    return {"id": job_id, "title": "Data Engineer", "organization": "Acme", "description_text": DESCRIPTION,
+            "url": f"https://example.com/{job_id}", **fields}
+
+
+def test_collapse_folds_jobs_into_a_shared_shape_job():
+    canonical = Job.from_provider("active", raw_job("a1")).to_shared()
+    jobs, duplicates = dedup.collapse([canonical, Job.from_provider("fantastic", raw_job(2))])
+    assert duplicates == 1 and len(jobs) == 1
+    assert jobs[0]["sources"] == ["active", "fantastic"]
+    assert jobs[0]["alternates"] == [{"id": 2, "provider": "fantastic", "url": "https://example.com/2"}]
+    # The cached job itself is left alone
+    assert canonical["sources"] == ["active"] and "alternates" not in canonical
+
+
+def test_collapse_keeps_distinct_jobs():
+    other = raw_job(2, title="Nurse", organization="Clinic", description_text="Care for patients " * 30)
+    jobs, duplicates = dedup.collapse([raw_job(1), other])
+    assert duplicates == 0 and [job["id"] for job in jobs] == [1, 2]
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    async def handler(request):
+        return httpx.Response(200, json={"jobs": [raw_job(1), raw_job(2), raw_job(3)]})
+
+    monkeypatch.setattr(upstream, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    cache.search_cache.clear()
+
+
+def test_streamed_search_is_deduplicated(mock_upstream):
+    payload = main.SearchPayload(api_key="k", stream=True, dedup=True, fields=["id"])
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        response = await main.search_jobs(payload, accept_encoding=None)
+        await response({"type": "http"}, receive, send)
+        return response
+
+    response = asyncio.run(run())
+    assert response.headers["X-Duplicates"] == "2"
+    body = b"".join(message.get("body", b"") for message in messages)
+    assert [orjson.loads(line) for line in body.splitlines()] == [{"id": 1}]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import federation
+import main
+
+
+def job(job_id, url=None, title="Data Engineer", posted="2024-05-01T10:00:00"):
+    return {"id": job_id, "title": title, "organization": "Acme", "url": url,
+            "locations_derived": ["Berlin"], "date_posted": posted}
+
+
+def test_urls_differing_only_in_query_are_different_jobs():
+    jobs, duplicates = federation.merge({"fantastic": [
+        job(1, "https://jobs.example/view?id=111"), job(2, "https://jobs.example/view?id=222"),
+    ]})
+    assert [j["provider_id"] for j in jobs] == ["1", "2"] and duplicates == 0
+
+
+def test_same_posting_from_both_providers_is_merged():
+    jobs, duplicates = federation.merge({
+        "fantastic": [job(1, "https://www.Jobs.example/view/")],
+        "active": [job(9, "https://jobs.example/view")],
+    })
+    assert len(jobs) == 1 and jobs[0]["sources"] == ["fantastic", "active"] and duplicates == 1
+
+
+def test_openings_without_url_stay_apart_within_a_provider():
+    jobs, duplicates = federation.merge({
+        "fantastic": [job(1), job(2), job(3)],
+        "active": [job(7), job(8)],
+    })
+    # Each fantastic opening absorbs at most one active opening
+    assert len(jobs) == 3 and duplicates == 2
+    assert sorted(len(j["sources"]) for j in jobs) == [1, 2, 2]
+
+
+def test_repeated_job_id_is_dropped_and_counted():
+    jobs, duplicates = federation.merge({"fantastic": [job(1, "https://a/1"), job(1, "https://a/1")]})
+    assert len(jobs) == 1 and duplicates == 1
+
+
+def test_merge_orders_newest_first():
+    jobs, _ = federation.merge({
+        "fantastic": [job(1, "https://a/1", posted="2024-01-01")],
+        "active": [job(2, "https://b/2", posted="2024-06-01")],
+    })
+    assert [j["provider"] for j in jobs] == ["active", "fantastic"]
+
+
+def test_fan_out_reports_errors_and_timeouts_without_dropping_the_rest():
+    async def ok():
+        return ["jobs"]
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def failing():
+        raise HTTPException(status_code=429, detail="quota")
+
+    results, errors = asyncio.run(federation.fan_out({"a": ok, "b": slow, "c": failing}, timeout=0.05))
+    assert results == {"a": ["jobs"]}
+    assert errors["b"]["status"] == "timeout"
+    assert errors["c"] == {"status": "error", "code": 429, "detail": "quota"}
+
+
+def test_federated_search_fails_when_every_provider_fails(monkeypatch):
+    async def failing(*args):
+        raise HTTPException(status_code=503, detail="down")
+
+    monkeypatch.setattr(main, "_provider_jobs", failing)
+    monkeypatch.setenv("FANTASTIC_RAPIDAPI_KEY", "k")
+    monkeypatch.setenv("ACTIVE_RAPIDAPI_KEY", "k")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(main.federated_search(main.SearchPayload(federated=True)))
+    assert raised.value.status_code == 503
+    assert set(raised.value.detail["providers"]) == set(federation.PROVIDERS)
@@ -0,0 +1,70 @@
+import pytest
+
+import job_store
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Engineer Python", [["Engineer", "Python"]]),
+    ("python engineer | data", [["python", "engineer"], ["data"]]),
+    ("x OR y", [["x"], ["y"]]),
+])
+def test_terms_plain_words(value, expected):
+    assert job_store._terms(value) == expected
+
+
+@pytest.mark.parametrize("value", ['"Data Engineer" -senior', "a & b", "!a", "(a | b) c", "c++"])
+def test_terms_rejects_unsupported_syntax(value):
+    assert job_store._terms(value) is None
+
+
+def test_local_query_ands_words_in_any_order():
+    query = job_store.local_query("fantastic", "24h", {"title_filter": "Engineer Python"})
+    assert query["$and"] == [{"$and": [
+        {"title": {"$regex": "Engineer", "$options": "i"}},
+        {"title": {"$regex": "Python", "$options": "i"}},
+    ]}]
+
+
+@pytest.mark.parametrize("params", [
+    {"title_filter": '"Data Engineer" -senior'},
+    {"description_filter": "spark -java"},
+    {"description_filter": "spark airflow | python"},
+])
+def test_local_query_defers_unsupported_filters_upstream(params):
+    assert job_store.local_query("fantastic", "24h", params) is None
+
+
+def test_local_query_description_words_are_all_required():
+    query = job_store.local_query("fantastic", "24h", {"description_filter": "spark airflow"})
+    assert query["$text"] == {"$search": '"spark" "airflow"'}
+
+
+def test_canonical_ids_survive_a_restart(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    import database
+    import dedup
+
+    monkeypatch.setattr(database, "_db", mongomock.MongoClient()["dedup_test"])
+    monkeypatch.setattr(dedup, "JOB_DEDUP_ENABLED", True)
+    monkeypatch.setattr(dedup, "job_index", dedup.DedupIndex(max_jobs=100))
+    description = "Build and run data pipelines for the analytics team " * 20
+    original = {"id": "1", "title": "Data Engineer", "organization": "Acme", "description_text": description}
+    job_store.write_jobs("fantastic", [original])
+
+    # A new process starts with an empty index and loads it from the store
+    monkeypatch.setattr(dedup, "job_index", dedup.DedupIndex(max_jobs=100))
+    assert job_store.load_dedup_index() == 1
+    repost = {**original, "id": "2", "url": "https://example.com/2"}
+    job_store.write_jobs("fantastic", [repost, {**original, "title": "Data Engineer II"}])
+
+    stored = {doc["job_id"]: doc["canonical_id"] for doc in database.db[job_store.JOBS_COLLECTION].find()}
+    assert stored == {"1": "fantastic:1", "2": "fantastic:1"}
+
+
+def test_dedup_index_forgets_oldest_jobs():
+    import dedup
+
+    index = dedup.DedupIndex(max_jobs=2)
+    for n in range(3):
+        index.canonical_id(str(n), {"title": f"Job {n} title words here"})
+    assert index.stats()["jobs"] == 2 and "0" not in index.lsh._signatures
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import async_database  # noqa: E402
+import dedup  # noqa: E402
+import job_store  # noqa: E402
+import main  # noqa: E402
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(async_database, "db", mongomock_motor.AsyncMongoMockClient()["local_test"])
+    monkeypatch.setattr(dedup, "JOB_DEDUP_ENABLED", True)
+    monkeypatch.setattr(dedup, "job_index", dedup.DedupIndex())
+    now = datetime.now(timezone.utc)
+    description = "Build and run data pipelines for the analytics team " * 20
+    jobs = [
+        {
+            "id": str(n),
+            "title": "Data Engineer",
+            "organization": "Acme",
+            "description_text": description,
+            "url": f"https://example.com/{n}",
+            "date_posted": (now - timedelta(hours=n)).strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for n in range(3)
+    ]
+    adb = async_database.db
+
+    async def fill():
+        await adb[job_store.JOBS_COLLECTION].bulk_write(job_store.upsert_ops("fantastic", jobs))
+        await adb[job_store.SYNCS_COLLECTION].insert_one({"_id": "fantastic:24h", "synced_at": now})
+
+    asyncio.run(fill())
+
+
+def search(**options):
+    payload = main.SearchPayload(api_key="k", time_window="24h", freshness=60, **options)
+    return asyncio.run(main.search_jobs(payload, accept_encoding=None))
+
+
+def test_local_results_hide_store_fields(store):
+    body = orjson.loads(search().body)
+    assert body["source"] == "local" and body["count"] == 3
+    for job in body["jobs"]:
+        assert not set(job) & set(job_store.STORE_FIELDS)
+
+
+def test_local_results_are_deduplicated(store):
+    body = orjson.loads(search(dedup=True, fields=["id", "alternates"]).body)
+    assert body["duplicates"] == 2
+    assert [job["id"] for job in body["jobs"]] == ["0"]
+    assert [alternate["id"] for alternate in body["jobs"][0]["alternates"]] == ["1", "2"]
+
+    response = search(dedup=True, stream=True)
+    assert response.headers["X-Duplicates"] == "2"
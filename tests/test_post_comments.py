@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+mongomock = pytest.importorskip("mongomock")
+
+import database  # noqa: E402
+import schema_examples  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient()["comments_test"]
+    monkeypatch.setattr(database, "_db", db)
+    return db
+
+
+def texts(comments):
+    return [comment["text"] for comment in comments]
+
+
+def test_pages_follow_positions_across_short_buckets(db, monkeypatch):
+    monkeypatch.setattr(schema_examples, "COMMENTS_PER_BUCKET", 3)
+    post_id = str(db.posts.insert_one({"title": "Post", "comment_count": 0}).inserted_id)
+    for n in range(7):
+        assert schema_examples.add_comment_to_post(post_id, "author", f"c{n}")
+    # A reserved position whose comment never made it to its bucket
+    db.posts.update_one({"_id": ObjectId(post_id)}, {"$inc": {"comment_count": 1}})
+    schema_examples.add_comment_to_post(post_id, "author", "c8")
+    # Writes can reach a bucket out of order
+    db.post_comment_buckets.update_one({"post_id": post_id, "bucket": 0}, {"$push": {
+        "comments": {"$each": [], "$sort": {"position": -1}},
+    }})
+
+    assert texts(schema_examples.get_post_comments(post_id, skip=0, limit=4)) == ["c0", "c1", "c2", "c3"]
+    assert texts(schema_examples.get_post_comments(post_id, skip=4, limit=4)) == ["c4", "c5", "c6", "c8"]
+
+
+def test_legacy_embedded_comments_are_read_and_migrated(db):
+    legacy = [{"id": str(n), "text": f"old{n}", "created_at": datetime(2024, 1, 1)} for n in range(3)]
+    post_id = str(db.posts.insert_one({"title": "Old post", "comments": legacy}).inserted_id)
+
+    assert texts(schema_examples.get_post_comments(post_id, skip=1, limit=5)) == ["old1", "old2"]
+
+    schema_examples.add_comment_to_post(post_id, "author", "new")
+    post = db.posts.find_one({"_id": ObjectId(post_id)})
+    assert "comments" not in post and post["comment_count"] == 4
+    assert texts(schema_examples.get_post_comments(post_id)) == ["old0", "old1", "old2", "new"]
+
+
+def test_migrate_post_comments(db):
+    legacy = [{"id": "1", "text": "old", "created_at": datetime(2024, 1, 1)}]
+    post_id = str(db.posts.insert_one({"title": "Old post", "comments": legacy}).inserted_id)
+    assert schema_examples.migrate_post_comments() == 1
+    assert texts(schema_examples.get_post_comments(post_id)) == ["old"]
+    assert schema_examples.migrate_post_comments() == 0
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import cache
+import main
+import ratelimit
+import upstream
+
+
+def test_delay_paces_the_rest_of_a_short_window():
+    limiter = ratelimit.KeyLimiter(rate=5, capacity=1)
+    limiter.observe({"x-ratelimit-requests-remaining": "10", "x-ratelimit-requests-reset": "100"}, 200)
+    assert limiter.rate == pytest.approx(0.1)
+    now = time.monotonic()
+    assert limiter.delay(now, "high") == 0
+    limiter.consume()
+    assert limiter.delay(now, "high") == pytest.approx(10, rel=0.01)
+
+
+def test_exhausted_window_blocks_until_reset():
+    limiter = ratelimit.KeyLimiter()
+    limiter.observe({"x-ratelimit-requests-remaining": "0", "x-ratelimit-requests-reset": "30"}, 200)
+    assert limiter.delay(time.monotonic(), "high") == pytest.approx(30, abs=0.5)
+
+
+def test_429_blocks_for_retry_after():
+    limiter = ratelimit.KeyLimiter()
+    limiter.observe({}, 429, retry_after="7")
+    assert limiter.delay(time.monotonic(), "high") == pytest.approx(7, abs=0.5)
+
+
+def test_low_priority_is_held_back_below_the_reserve():
+    limiter = ratelimit.KeyLimiter()
+    limiter.observe({"x-ratelimit-requests-remaining": "10", "x-ratelimit-requests-limit": "100",
+                     "x-ratelimit-requests-reset": "86400"}, 200)
+    now = time.monotonic()
+    assert limiter.delay(now, "high") == 0
+    assert limiter.delay(now, "low") >= 1
+
+
+def test_job_count_quotas_are_ignored():
+    assert ratelimit.parse_quota({"x-ratelimit-jobs-remaining": "0"}) is None
+
+
+def throttled_key(api_key: str):
+    """A key with no tokens left, refilling one in 0.1s"""
+    limiter = ratelimit.get_limiter(api_key)
+    limiter.rate, limiter.tokens, limiter.updated = 10.0, 0.0, time.monotonic()
+
+
+def test_acquire_refuses_low_priority_and_queues_high():
+    throttled_key("acquire-test")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(ratelimit.acquire("acquire-test", "low"))
+    assert ratelimit.refused(raised.value, "low")
+    asyncio.run(ratelimit.acquire("acquire-test", "high"))
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"jobs": [{"id": 1}]})
+
+    monkeypatch.setattr(upstream, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    cache.search_cache.clear()
+    return calls
+
+
+def test_high_priority_search_joining_a_refused_low_priority_call_still_succeeds(mock_upstream):
+    throttled_key("coalesce-test")
+
+    async def search(priority):
+        payload = main.SearchPayload(api_key="coalesce-test", priority=priority, limit=7)
+        try:
+            return await main.search_jobs(payload, accept_encoding=None)
+        except HTTPException as e:
+            return e.status_code
+
+    async def both():
+        # Low starts the shared call, high joins it before it runs
+        return await asyncio.gather(search("low"), search("high"))
+
+    low, high = asyncio.run(both())
+    assert low == 429
+    assert high.status_code == 200 and len(mock_upstream) == 1
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+import main
+import upstream
+
+
+class Body(httpx.AsyncByteStream):
+    """Upstream body that records whether it was closed"""
+
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def upstream_body(monkeypatch):
+    body = Body()
+
+    def handler(request):
+        return httpx.Response(200, stream=body)
+
+    monkeypatch.setattr(upstream, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return body
+
+
+def stream(body: Body, disconnect: bool = False):
+    payload = main.SearchPayload(api_key="k", stream=True, no_cache=True)
+    messages = []
+
+    async def receive():
+        # A disconnecting client goes away while its first line is being sent
+        await asyncio.sleep(0.05 if disconnect else 3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if disconnect and message.get("body"):
+            await asyncio.sleep(3600)
+
+    async def run():
+        response = await main.search_jobs(payload, accept_encoding=None)
+        await response({"type": "http"}, receive, send)
+        # Before the event loop gets to finalize abandoned generators
+        return body.closed
+
+    closed = asyncio.run(run())
+    return b"".join(message.get("body", b"") for message in messages), closed
+
+
+def test_invalid_upstream_json_becomes_an_error_line(upstream_body):
+    upstream_body.chunks = (b'{"jobs": [{"id": 1}, {"id": 2,,}]}',)
+    body, closed = stream(upstream_body)
+    lines = [orjson.loads(line) for line in body.splitlines()]
+    assert lines[0] == {"id": 1}
+    assert lines[1]["error"]["status"] == 502
+    assert closed
+
+
+def test_upstream_body_is_closed_when_the_client_disconnects(upstream_body):
+    upstream_body.chunks = (b'{"jobs": [{"id": 1}]}',)
+    _, closed = stream(upstream_body, disconnect=True)
+    assert closed
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import database  # noqa: E402
+import job_store  # noqa: E402
+import sync_worker  # noqa: E402
+import upstream  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    db = mongomock.MongoClient(tz_aware=True)["sync_test"]
+    monkeypatch.setattr(database, "_db", db)
+    monkeypatch.setenv("FANTASTIC_RAPIDAPI_KEY", "test-key")
+
+    async def fetch_jobs(url, headers, params, priority="high"):
+        return {"jobs": [], "rate_limits": {}, "size": 2}
+
+    monkeypatch.setattr(upstream, "fetch_jobs", fetch_jobs)
+
+    state = {"now": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    monkeypatch.setattr(sync_worker, "_now", lambda: state["now"])
+    return state
+
+
+def synced_at(window):
+    doc = database.db[job_store.SYNCS_COLLECTION].find_one({"_id": f"{sync_worker.PROVIDER}:{window}"})
+    return doc.get("synced_at") if doc else None
+
+
+def run_ticks(clock, ticks, tick=timedelta(minutes=15)):
+    for _ in range(ticks):
+        asyncio.run(sync_worker.run_once())
+        clock["now"] += tick
+
+
+def test_consecutive_hourly_runs_cover_derived_windows(clock):
+    # 8 days of scheduler ticks every 15 minutes
+    run_ticks(clock, 8 * 24 * 4)
+
+    assert synced_at("hourly") is not None
+    for window in sync_worker.DERIVED_WINDOWS[:2]:
+        assert synced_at(window) is not None, window
+    # The 6-month backfill can't be covered by 8 days of hourly runs
+    assert synced_at("backfill") is None
+
+
+def test_missed_hourly_run_restarts_coverage(clock):
+    run_ticks(clock, 12 * 4)
+    # Nothing runs for two hours: jobs created in the gap were never seen
+    clock["now"] += timedelta(hours=2)
+    run_ticks(clock, 20 * 4)
+    assert synced_at("24h") is None
+
+    run_ticks(clock, 5 * 4)
+    assert synced_at("24h") is not None
+
+
+def test_failed_run_releases_lease(clock, monkeypatch):
+    async def broken(url, headers, params, priority="high"):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(upstream, "fetch_jobs", broken)
+    with pytest.raises(RuntimeError):
+        asyncio.run(sync_worker.run_once())
+
+    doc = database.db[job_store.SYNCS_COLLECTION].find_one({"_id": f"{sync_worker.PROVIDER}:hourly"})
+    assert "lease_owner" not in doc
+    assert sync_worker.claim_window("hourly") is not None
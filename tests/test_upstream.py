@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import upstream
+
+
+def test_concurrent_calls_share_one_result():
+    flights = upstream.SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "jobs"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", fetch) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["jobs"] * 3
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2, "abandoned": 0}
+
+
+def test_concurrent_calls_share_one_error():
+    flights = upstream.SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=502, detail="upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(e, HTTPException) and e.status_code == 502 for e in errors)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_call_running_for_the_others():
+    flights = upstream.SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "jobs"
+
+    async def run():
+        leaving = asyncio.ensure_future(flights.do("k", fetch))
+        staying = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(run()) == "jobs"
+    assert flights.abandoned == 0
+
+
+def test_last_waiter_leaving_cancels_the_call():
+    flights = upstream.SingleFlight()
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        waiters = [asyncio.ensure_future(flights.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Let the cancelled call unwind
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [1]
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1, "abandoned": 1}
+
+
+def pages(total: int, page_size: int = 10, fail=None, delays=None):
+    """A fetch_page over `total` jobs, recording each offset it is asked for"""
+    requested = []
+
+    async def fetch_page(offset):
+        requested.append(offset)
+        await asyncio.sleep((delays or {}).get(offset, 0))
+        if fail is not None and fail(offset, requested.count(offset)):
+            raise HTTPException(status_code=503, detail=f"page {offset} failed")
+        return list(range(offset, min(offset + page_size, total)))
+
+    return fetch_page, requested
+
+
+def collect(fetch_page, max_results=50, page_size=10):
+    async def run():
+        return [item async for item in upstream.iter_pages(fetch_page, 0, page_size, max_results, concurrency=2)]
+
+    return asyncio.run(run())
+
+
+def test_pages_stop_at_the_first_short_page():
+    fetch_page, requested = pages(total=25)
+    results = collect(fetch_page)
+    assert [(offset, len(page)) for offset, page, _ in results] == [(0, 10), (10, 10), (20, 5)]
+    assert 40 not in requested
+
+
+def test_pages_come_out_in_offset_order():
+    # Later pages finish first
+    fetch_page, _ = pages(total=100, delays={0: 0.03, 10: 0.02})
+    results = collect(fetch_page, max_results=40)
+    assert [offset for offset, _, _ in results] == [0, 10, 20, 30]
+    assert [job for _, page, _ in results for job in page] == list(range(40))
+
+
+def test_failed_page_is_retried(monkeypatch):
+    monkeypatch.setattr(upstream, "PAGE_RETRY_BACKOFF", 0)
+    fetch_page, requested = pages(total=30, fail=lambda offset, attempt: offset == 10 and attempt == 1)
+    jobs, failed = asyncio.run(upstream.fetch_pages(fetch_page, 0, 10, 30))
+    assert jobs == list(range(30)) and failed == []
+    assert requested.count(10) == 2
+
+
+def test_page_failing_every_retry_is_reported(monkeypatch):
+    monkeypatch.setattr(upstream, "PAGE_RETRY_BACKOFF", 0)
+    fetch_page, requested = pages(total=30, fail=lambda offset, attempt: offset == 10)
+    jobs, failed = asyncio.run(upstream.fetch_pages(fetch_page, 0, 10, 30))
+    assert jobs == list(range(10)) + list(range(20, 30))
+    assert failed == [{"offset": 10, "status": 503, "detail": "page 10 failed"}]
+    assert requested.count(10) == upstream.PAGE_RETRIES + 1
+
+
+def test_fetch_pages_raises_when_every_page_fails(monkeypatch):
+    monkeypatch.setattr(upstream, "PAGE_RETRY_BACKOFF", 0)
+    fetch_page, _ = pages(total=30, fail=lambda offset, attempt: True)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upstream.fetch_pages(fetch_page, 0, 10, 30))
+    assert raised.value.status_code == 503
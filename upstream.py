@@ -0,0 +1,345 @@
+"""
+Upstream HTTP Client
+
+Shared, app-lifetime async HTTP client for the RapidAPI job providers.
+httpx keeps a keep-alive connection pool per origin, so every RapidAPI host
+gets its own pool and searches reuse warm TCP/TLS connections instead of
+paying a new handshake per request.
+"""
+
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+import fastjson
+import ratelimit
+from streaming import JobArraySplitter
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _client_settings() -> Dict[str, Any]:
+    """Pool and timeout settings, configurable from the environment"""
+    max_connections = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 100))
+    max_keepalive = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", 20))
+    keepalive_expiry = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", 30))
+    timeout = float(os.getenv("UPSTREAM_TIMEOUT", 30))
+    http2 = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes")
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+        "http2": http2 and _http2_available(),
+    }
+
+
+async def startup():
+    """Create the shared client (call once on app startup)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(**_client_settings())
+    return _client
+
+
+async def shutdown():
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(**_client_settings())
+    return _client
+
+
+def get_endpoint_path_fantastic(window: str) -> str:
+    """Fantastic.jobs endpoint path for a time window"""
+    mapping = {
+        "7d": "/jobs/7d",
+        "24h": "/jobs/24h",
+        "hourly": "/jobs/hourly",
+        "backfill": "/jobs/6m",
+        "expired": "/jobs/expired",
+        "modified": "/jobs/modified",
+    }
+    return mapping.get(window, "/jobs/7d")
+
+
+def rate_limit_headers(headers: httpx.Headers) -> Dict[str, str]:
+    """Collect rate limit headers if present"""
+    return {
+        k.lower(): v
+        for k, v in headers.items()
+        if k.lower().startswith("x-ratelimit") or k.lower().startswith("ratelimit")
+    }
+
+
+def extract_jobs(data: Any) -> List[Any]:
+    """Normalize: some APIs return arrays, others objects"""
+    if isinstance(data, list):
+        return data
+    return data.get("results") or data.get("jobs") or data.get("data") or []
+
+
+async def fetch_jobs(
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+    priority: str = "high",
+) -> Dict[str, Any]:
+    """Run one upstream search and return its jobs, rate limits and body size"""
+    api_key = headers.get("X-RapidAPI-Key", "")
+    await ratelimit.acquire(api_key, priority)
+    try:
+        resp = await get_client().get(url, headers=headers, params=params)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail={"message": "Network error", "error": str(e)})
+
+    rl_headers = rate_limit_headers(resp.headers)
+    ratelimit.get_limiter(api_key).observe(rl_headers, resp.status_code, resp.headers.get("retry-after"))
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail={
+            "message": "Upstream API error",
+            "status": resp.status_code,
+            "text": resp.text,
+            "endpoint": url,
+            "params": params,
+            "rate_limits": rl_headers,
+        })
+
+    jobs = extract_jobs(fastjson.loads(resp.content))
+    return {
+        "jobs": jobs,
+        "rate_limits": rl_headers,
+        "size": len(resp.content),
+    }
+
+
+PAGE_RETRIES = int(os.getenv("UPSTREAM_PAGE_RETRIES", 2))
+PAGE_RETRY_BACKOFF = float(os.getenv("UPSTREAM_PAGE_RETRY_BACKOFF", 0.5))
+
+
+def _retryable(exc: HTTPException) -> bool:
+    # Upstream 5xx and network errors are worth another try; 4xx and our own
+    # rate limiter's 429 are not
+    return exc.status_code >= 500
+
+
+async def iter_pages(
+    fetch_page: Callable[[int], Awaitable[List[Any]]],
+    start_offset: int,
+    page_size: int,
+    max_results: int,
+    concurrency: int = 4,
+) -> AsyncIterator[Tuple[int, Optional[List[Any]], Optional[HTTPException]]]:
+    """
+    Fetch offset pages concurrently and yield them in offset order.
+
+    At most `concurrency` pages are in flight at once, and each page is
+    yielded as (offset, jobs, None) as soon as it and every earlier page are
+    done. The first short page marks the end of the result set: later pages
+    are skipped or cancelled. Each failed page is retried on its own; a page
+    that still fails is yielded as (offset, None, error).
+    """
+    offsets = list(range(start_offset, start_offset + max_results, page_size))
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: Dict[int, "asyncio.Task"] = {}
+    last_offset = offsets[-1]
+
+    async def run(offset: int) -> Optional[List[Any]]:
+        nonlocal last_offset
+        async with semaphore:
+            if offset > last_offset:
+                return None
+            for attempt in range(PAGE_RETRIES + 1):
+                try:
+                    jobs = await fetch_page(offset)
+                    break
+                except HTTPException as e:
+                    if attempt == PAGE_RETRIES or not _retryable(e):
+                        raise
+                    await asyncio.sleep(PAGE_RETRY_BACKOFF * 2 ** attempt)
+        if len(jobs) < page_size and offset < last_offset:
+            last_offset = offset
+            for later, task in tasks.items():
+                if later > offset:
+                    task.cancel()
+        return jobs
+
+    for offset in offsets:
+        tasks[offset] = asyncio.ensure_future(run(offset))
+    try:
+        for offset in offsets:
+            if offset > last_offset:
+                break
+            try:
+                jobs = await tasks[offset]
+            except HTTPException as e:
+                yield offset, None, e
+                continue
+            yield offset, jobs or [], None
+    finally:
+        # The consumer may stop early (e.g. client disconnected)
+        for task in tasks.values():
+            task.cancel()
+
+
+async def fetch_pages(
+    fetch_page: Callable[[int], Awaitable[List[Any]]],
+    start_offset: int,
+    page_size: int,
+    max_results: int,
+    concurrency: int = 4,
+) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Fetch pages with iter_pages and merge them in offset order.
+
+    Pages that still fail after their retries are returned in the list of
+    failures instead of failing the call, unless every page failed.
+    """
+    jobs: List[Any] = []
+    failed: List[Dict[str, Any]] = []
+    errors: List[HTTPException] = []
+    pages = 0
+    async for offset, page, exc in iter_pages(fetch_page, start_offset, page_size, max_results, concurrency):
+        pages += 1
+        if exc is not None:
+            failed.append({"offset": offset, "status": exc.status_code, "detail": exc.detail})
+            errors.append(exc)
+        else:
+            jobs.extend(page)
+
+    if errors and len(errors) == pages:
+        # Nothing came back at all: surface the error as a plain search would
+        raise errors[0]
+    return jobs[:max_results], failed
+
+
+async def open_job_stream(
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+    priority: str = "high",
+) -> Tuple[httpx.Response, Dict[str, str]]:
+    """
+    Start an upstream search without reading its body.
+
+    Status and rate limit headers are checked up front so errors surface
+    as a normal HTTPException before any streamed output has been sent.
+    The caller must consume the response with iter_stream_jobs.
+    """
+    api_key = headers.get("X-RapidAPI-Key", "")
+    await ratelimit.acquire(api_key, priority)
+    client = get_client()
+    request = client.build_request("GET", url, headers=headers, params=params)
+    try:
+        resp = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail={"message": "Network error", "error": str(e)})
+
+    rl_headers = rate_limit_headers(resp.headers)
+    ratelimit.get_limiter(api_key).observe(rl_headers, resp.status_code, resp.headers.get("retry-after"))
+    if resp.status_code != 200:
+        await resp.aread()
+        await resp.aclose()
+        raise HTTPException(status_code=resp.status_code, detail={
+            "message": "Upstream API error",
+            "status": resp.status_code,
+            "text": resp.text,
+            "endpoint": url,
+            "params": params,
+            "rate_limits": rl_headers,
+        })
+    return resp, rl_headers
+
+
+async def iter_stream_jobs(resp: httpx.Response) -> AsyncIterator[Any]:
+    """Yield jobs one by one as they are parsed out of a streamed body"""
+    splitter = JobArraySplitter()
+    try:
+        async for chunk in resp.aiter_bytes():
+            for raw in splitter.feed(chunk):
+                yield fastjson.loads(raw)
+    finally:
+        await resp.aclose()
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one.
+
+    The first caller for a key starts the work; later callers with the same
+    key await the same task and get the same result or the same exception.
+    The work is cancelled only once every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to receive the result
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+search_flights = SingleFlight()